@@ -26,6 +26,8 @@ import ntpath
 from beancount.core import data
 from beancount.ingest import importer
 from beancount.core.number import D
+from beancount_reds_importers.libreader import dates
+from beancount_reds_importers.libreader import filebuffer
 
 # account flow                          ingest source
 # ----------------------------------------------------
@@ -52,10 +54,10 @@ class Importer(importer.ImporterProtocol):
     def file_date(self, file):
         "Get the maximum date from the file."
         maxdate = datetime.date.min
-        for line in open(file.name, 'r').readlines()[1:]:
+        for line in filebuffer.open_text(file.name).readlines()[1:]:
             f = line.split('\t')
             f = [i.strip() for i in f]
-            date = datetime.datetime.strptime(f[0], '%B %d, %Y').date()
+            date = dates.parse(f[0], '%B %d, %Y').date()
             maxdate = max(date, maxdate)
         return maxdate
 
@@ -65,10 +67,10 @@ class Importer(importer.ImporterProtocol):
         new_entries = []
 
         counter = itertools.count()
-        for line in open(file.name, 'r').readlines()[1:]:
+        for line in filebuffer.open_text(file.name).readlines()[1:]:
             f = line.split('\t')
             f = [i.strip() for i in f]
-            date = datetime.datetime.strptime(f[0], '%B %d, %Y').date()
+            date = dates.parse(f[0], '%B %d, %Y').date()
             description = f[1].encode("ascii", "ignore").decode()
             number = D(f[2].replace('$', ''))
 
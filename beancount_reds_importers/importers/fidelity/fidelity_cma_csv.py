@@ -16,6 +16,7 @@ class Importer(banking.Importer, csvreader.Importer):
         header_s1 = "Commission \\(\\$\\),Fees \\(\\$\\),Accrued Interest \\(\\$\\),Amount \\(\\$\\),Settlement Date"
         header_sum = header_s0 + header_s1
         self.header_identifier = header_sum
+        self.header_identifier_flags = re.DOTALL
         self.skip_head_rows = 5
         self.skip_tail_rows = 16
         self.header_map = {
@@ -33,9 +34,6 @@ class Importer(banking.Importer, csvreader.Importer):
                "Price ($)":            'unit_price',
                }
 
-    def deep_identify(self, file):
-        return re.match(self.header_identifier, file.head(), flags=re.DOTALL)
-
     def prepare_raw_columns(self, rdr):
 
         for field in ['Action']:
@@ -1,9 +1,9 @@
 """ Schwab csv importer."""
 
-import datetime
 import re
 from beancount.core.number import D
 from beancount_reds_importers.libreader import csv_multitable_reader
+from beancount_reds_importers.libreader import dates
 from beancount_reds_importers.libtransactionbuilder import investments
 
 
@@ -44,24 +44,29 @@ class Importer(investments.Importer, csv_multitable_reader.Importer):
         return rdr
 
     def file_date(self, file):
-        return self.date.date()
+        # read only the first row, which has the date
+        return self.get_statement_date(next(self.iter_raw_rows(file))).date()
+
+    def get_statement_date(self, first_row):
+        d = first_row[0].rsplit(' ', 1)[1]
+        return dates.parse(d, self.date_format)
 
     def get_max_transaction_date(self):
         return self.date.date()
 
     def prepare_tables(self):
         # first row has date
-        d = self.raw_rdr[0][0].rsplit(' ', 1)[1]
-        self.date = datetime.datetime.strptime(d, self.date_format)
+        self.date = self.get_statement_date(next(self.iter_raw_rows(self.file)))
 
-        for section, table in self.alltables.items():
-            if section in self.config['section_headers']:
-                table = table.rename(self.header_map)
-                table = self.convert_columns(table)
-                table = table.cut('memo', 'security', 'units', 'unit_price')
-                table = table.selectne('memo', '--')  # we don't need total rows
-                table = table.addfield('date', self.date)
-                self.alltables[section] = table
+    def prepare_section(self, section, table):
+        if section not in self.config['section_headers']:
+            return table
+        table = table.rename(self.header_map)
+        table = self.convert_columns(table)
+        table = table.cut('memo', 'security', 'units', 'unit_price')
+        table = table.selectne('memo', '--')  # we don't need total rows
+        table = table.addfield('date', self.date)
+        return table
 
     def get_balance_positions(self):
         for section in self.config['section_headers']:
@@ -1,5 +1,6 @@
 """ Schwab Brokerage .csv importer."""
 
+import datetime
 import re
 from beancount_reds_importers.libreader import csvreader
 from beancount_reds_importers.libtransactionbuilder import investments
@@ -10,6 +11,10 @@ class Importer(csvreader.Importer, investments.Importer):
 
     def custom_init(self):
         self.year, self.month = self.config.get("ym", "").split('-', 2)
+        # only import the month in 'ym'. Filtered in the reader, before rows are converted (see rowfilter.py)
+        year, month = int(self.year), int(self.month)
+        self.filter_start_date = datetime.date(year, month, 1)
+        self.filter_end_date = datetime.date(year + month // 12, month % 12 + 1, 1)
         self.max_rounding_error = 0.04
         self.filename_pattern_def = '.*_Transactions_'
         self.header_identifier = rf'"Transactions  for account {self.config.get("account_number", "")}.*'
@@ -98,15 +103,16 @@ class Importer(csvreader.Importer, investments.Importer):
 
         
         rdr = rdr.convert('Date', cleanup_date)
-        rdr = rdr.select('Date', lambda v: (v.startswith(self.month) and v.endswith(self.year)))
         rdr = rdr.addfield('tradeDate', lambda x: x['Date'])
         rdr = rdr.addfield('total', lambda x: x['Amount'])
         return rdr
 
+    def compile_reader(self):
+        super().compile_reader()
+        want = self.config.get("account_number", "")
+        self.account_header_regexes = [re.compile(rf'"Transactions  for account {raw}.*')
+                                       for raw, acct in self.acctmap.items() if acct == want]
+
     def deep_identify(self, file):
         head = file.head()
-        want = self.config.get("account_number", "")
-        for raw, acct in self.acctmap.items():
-            if acct == want and re.match(rf'"Transactions  for account {raw}.*', head):
-                return True
-        return False
+        return any(r.match(head) for r in self.account_header_regexes)
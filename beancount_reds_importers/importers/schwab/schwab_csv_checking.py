@@ -30,6 +30,7 @@ class Importer(csvreader.Importer, banking.Importer):
             "ACH": 'transfer'
         }
         self.skip_transaction_types = ['Journal']
+        self.filter_skip_transaction_types = False  # get_balance_statement() reads all rows
         self.skip_head_rows = 1
         self.skip_data_rows = 2
 
@@ -44,7 +45,11 @@ class Importer(csvreader.Importer, banking.Importer):
 
         max_date = self.get_max_transaction_date()
         if max_date:
-            for row in [self.rdr.namedtuples()[0], self.rdr.namedtuples()[len(self.rdr) - 2]]:
+            first = last = None
+            for row in self.rdr.namedtuples():  # a single pass, so this works in streaming mode too
+                first = first or row
+                last = row
+            for row in [first, last]:
                 date = row.date.date() + datetime.timedelta(days=1)
                 # See comment in get_max_transaction_date() for explanation of the above line
                 Balance = namedtuple('Balance', ['date', 'amount'])
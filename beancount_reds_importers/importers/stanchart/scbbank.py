@@ -1,11 +1,11 @@
 """SCB Banking .csv importer."""
 
+from beancount_reds_importers.libreader import amounts
 from beancount_reds_importers.libreader import csvreader
+from beancount_reds_importers.libreader import transforms
 from beancount_reds_importers.libtransactionbuilder import banking
 from collections import namedtuple
 import datetime
-import re
-from beancount.core.number import D
 
 
 class Importer(csvreader.Importer, banking.Importer):
@@ -16,7 +16,9 @@ class Importer(csvreader.Importer, banking.Importer):
         self.filename_pattern_def = 'AccountTransactions[0-9]*'
         self.header_identifier = self.config.get('custom_header', 'Account transactions shown:')
         self.column_labels_line = 'Date,Transaction,Currency,Deposit,Withdrawal,Running Balance,SGD Equivalent Balance'
-        self.balance_column_labels_line = 'Account Name,Account Number,Currency,Current Balance,Available Balance'
+        self.secondary_table_labels = {
+            'balance': 'Account Name,Account Number,Currency,Current Balance,Available Balance',
+        }
         self.date_format = '%d/%m/%Y'
         self.skip_tail_rows = 0
         self.skip_comments = '# '
@@ -34,19 +36,19 @@ class Importer(csvreader.Importer, banking.Importer):
 
     def deep_identify(self, file):
         account_number = self.config.get('account_number', '')
-        return re.match(self.header_identifier, file.head()) and \
+        return self.header_regex.match(file.head()) and \
             account_number in file.head()
 
     # TODO: move into utils, since this is probably a common operation
     def prepare_table(self, rdr):
-        rdr = rdr.addfield('amount',
-                           lambda x: "-" + x['Withdrawal'] if x['Withdrawal'] != '' else x['Deposit'])
-        rdr = rdr.addfield('memo', lambda x: '')
-        return rdr
+        transform = transforms.Transform()
+        transform.addfield('amount', lambda x: amounts.debit_credit(x['Withdrawal'], x['Deposit']))
+        transform.addfield('memo', '')
+        return transform.apply(rdr)
 
     def prepare_raw_file(self, rdr):
         # Strip tabs and spaces around each field in the entire file
-        rdr = rdr.convertall(lambda x: x.strip(' \t') if isinstance(x, str) else x)
+        rdr = transforms.Transform().strip(' \t').apply(rdr)
 
         return rdr
 
@@ -54,12 +56,9 @@ class Importer(csvreader.Importer, banking.Importer):
         """Return the balance on the first and last dates"""
         max_date = self.get_max_transaction_date()
         if max_date:
-            rdr = self.read_raw(file)
-            rdr = self.prepare_raw_file(rdr)
-            col_labels = self.balance_column_labels_line.split(',')
-            rdr = self.extract_table_with_header(rdr, col_labels)
+            rdr = self.get_secondary_table(file, 'balance')
 
-            header_map = {k: k.replace(' ', '_') for k in col_labels}
+            header_map = {k: k.replace(' ', '_') for k in self.secondary_column_labels['balance']}
             rdr = rdr.rename(header_map)
 
             while '' in rdr.header():
@@ -69,8 +68,4 @@ class Importer(csvreader.Importer, banking.Importer):
             Balance = namedtuple('Balance', ['date', 'amount', 'currency'])
 
             row = rdr.namedtuples()[0]
-            amount = row.Current_Balance
-            units, debitcredit = amount.split()
-            if debitcredit != 'CR':
-                units = '-' + units
-            yield Balance(date, D(units), row.Currency)
+            yield Balance(date, amounts.parse(row.Current_Balance), row.Currency)
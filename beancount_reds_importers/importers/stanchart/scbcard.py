@@ -1,11 +1,11 @@
 """SCB Credit .csv importer."""
 
+from beancount_reds_importers.libreader import amounts
 from beancount_reds_importers.libreader import csvreader
+from beancount_reds_importers.libreader import transforms
 from beancount_reds_importers.libtransactionbuilder import banking
 from collections import namedtuple
 import datetime
-import re
-from beancount.core.number import D
 
 
 class Importer(csvreader.Importer, banking.Importer):
@@ -16,6 +16,7 @@ class Importer(csvreader.Importer, banking.Importer):
         self.filename_pattern_def = 'CardTransactions[0-9]*'
         self.header_identifier = self.config.get('custom_header', 'PRIORITY BANKING VISA INFINITE CARD')
         self.column_labels_line = 'Date,DESCRIPTION,Foreign Currency Amount,SGD Amount'
+        self.row_labels = ['Current Balance']
         self.date_format = '%d/%m/%Y'
         self.skip_tail_rows = 6
         self.skip_comments = '# '
@@ -27,14 +28,15 @@ class Importer(csvreader.Importer, banking.Importer):
 
     def deep_identify(self, file):
         account_number = self.config.get('account_number', '')
-        return re.match(self.header_identifier, file.head()) and \
+        return self.header_regex.match(file.head()) and \
             account_number in file.head()
 
     def skip_transaction(self, row):
         return '[UNPOSTED]' in row.payee
 
     def prepare_table(self, rdr):
-        rdr = rdr.select(lambda r: 'UNPOSTED' not in r['DESCRIPTION'])
+        transform = transforms.Transform()
+        transform.select(lambda r: 'UNPOSTED' not in r['DESCRIPTION'])
 
         # parse foreign_currency amount: "YEN 74,000"
         if self.config.get('convert_currencies', False):
@@ -43,27 +45,27 @@ class Importer(csvreader.Importer, banking.Importer):
             # See https://groups.google.com/g/beancount/c/nMvuoR4yOmM
             # This means the '@' generated by this code below needs to be replaced with an '@@'
 
-            rdr = rdr.capture('Foreign Currency Amount', '(.*) (.*)',
+            transform.capture('Foreign Currency Amount', '(.*) (.*)',
                               ['foreign_currency', 'foreign_amount'],
                               fill=' ', include_original=True)
-        rdr = rdr.cutout('Foreign Currency Amount')
+        transform.cutout('Foreign Currency Amount')
 
-        # parse SGD Amount: "SGD 141.02 CR" into a single amount column
-        rdr = rdr.capture('SGD Amount', '(.*) (.*) (.*)', ['currency', 'amount', 'crdr'])
+        # parse SGD Amount: "SGD 141.02 CR" into currency and amount columns, with DR as -ve
+        transform.addfield('currency', lambda x: amounts.currency(x['SGD Amount']))
+        transform.addfield('amount', lambda x: amounts.parse(x['SGD Amount']))
+        transform.cutout('SGD Amount')
 
-        # change DR into -ve. TODO: move this into csvreader or csvreader.utils
-        crdrdict = {'DR': '-', 'CR': ''}
-        rdr = rdr.convert('amount', lambda i, row: crdrdict[row.crdr] + i, pass_row=True)
-
-        rdr = rdr.addfield('memo', lambda x: '')  # TODO: make this non-mandatory in csvreader
-        return rdr
+        transform.addfield('memo', '')  # TODO: make this non-mandatory in csvreader
+        return transform.apply(rdr)
 
     def prepare_raw_file(self, rdr):
+        transform = transforms.Transform()
         # Strip tabs and spaces around each field in the entire file
-        rdr = rdr.convertall(lambda x: x.strip(' \t') if isinstance(x, str) else x)
+        transform.strip(' \t')
 
         # Delete empty rows
-        rdr = rdr.select(lambda x: any([i != '' for i in x]))
+        transform.select(lambda x: any([i != '' for i in x]))
+        rdr = transform.apply(rdr)
         return rdr
 
     def get_balance_statement(self, file=None):
@@ -72,11 +74,8 @@ class Importer(csvreader.Importer, banking.Importer):
         if max_date:
             balance_row = self.get_row_by_label(file, 'Current Balance')
             currency, amount = balance_row[1], balance_row[2]
-            units, debitcredit = amount.split()
-            if debitcredit != 'CR':
-                units = '-' + units
 
             date = max_date + datetime.timedelta(days=1)
             Balance = namedtuple('Balance', ['date', 'amount', 'currency'])
 
-            yield Balance(date, D(units), currency)
+            yield Balance(date, amounts.parse(amount), currency)
@@ -1,10 +1,10 @@
 """United Overseas Bank, Bank account .csv importer."""
 
+from beancount_reds_importers.libreader import transforms
 from beancount_reds_importers.libreader import xlsreader
 from beancount_reds_importers.libtransactionbuilder import banking
 from collections import namedtuple
 import datetime
-import re
 from beancount.core.number import D
 
 
@@ -16,6 +16,7 @@ class Importer(xlsreader.Importer, banking.Importer):
         self.filename_pattern_def = 'ACC_TXN_History[0-9]*'
         self.header_identifier = self.config.get('custom_header', 'United Overseas Bank Limited.*Account Type:Uniplus Account')
         self.column_labels_line = 'Transaction Date,Transaction Description,Withdrawal,Deposit,Available Balance'
+        self.row_labels = ['Account Number:']
         self.date_format = '%d %b %Y'
         self.header_map = {
             'Transaction Date': 'date',
@@ -27,25 +28,28 @@ class Importer(xlsreader.Importer, banking.Importer):
 
     def deep_identify(self, file):
         account_number = self.config.get('account_number', '')
-        return re.match(self.header_identifier, file.head()) and \
+        return self.header_regex.match(file.head()) and \
             account_number in file.head()
 
     # TODO: move these into utils, since this is probably a common operation
     def prepare_table(self, rdr):
+        transform = transforms.Transform()
         # Remove carriage returns in description
-        rdr = rdr.convert('Transaction Description', lambda x: x.replace('\n', ' '))
+        transform.convert('Transaction Description', lambda x: x.replace('\n', ' '))
 
-        rdr = rdr.addfield('amount',
+        transform.addfield('amount',
                            lambda x: -1 * D(x['Withdrawal']) if x['Withdrawal'] != 0 else D(x['Deposit']))
-        rdr = rdr.addfield('memo', lambda x: '')
-        return rdr
+        transform.addfield('memo', '')
+        return transform.apply(rdr)
 
     def prepare_raw_file(self, rdr):
+        transform = transforms.Transform()
         # Strip tabs and spaces around each field in the entire file
-        rdr = rdr.convertall(lambda x: x.strip(' \t') if isinstance(x, str) else x)
+        transform.strip(' \t')
 
         # Delete empty rows
-        rdr = rdr.select(lambda x: any([i != '' for i in x]))
+        transform.select(lambda x: any([i != '' for i in x]))
+        rdr = transform.apply(rdr)
 
         return rdr
 
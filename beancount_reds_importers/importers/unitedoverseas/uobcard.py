@@ -1,10 +1,10 @@
 """SCB Credit .csv importer."""
 
+from beancount_reds_importers.libreader import transforms
 from beancount_reds_importers.libreader import xlsreader
 from beancount_reds_importers.libtransactionbuilder import banking
 from collections import namedtuple
 import datetime
-import re
 from beancount.core.number import D
 
 
@@ -16,6 +16,7 @@ class Importer(xlsreader.Importer, banking.Importer):
         self.filename_pattern_def = '^CC_TXN_History[0-9]*'
         self.header_identifier = self.config.get('custom_header', 'United Overseas Bank Limited.*Account Type:VISA SIGNATURE')
         self.column_labels_line = 'Transaction Date,Posting Date,Description,Foreign Currency Type,Transaction Amount(Foreign),Local Currency Type,Transaction Amount(Local)'  # noqa: E501
+        self.row_labels = ['Statement Balance:']
         self.date_format = '%d %b %Y'
 
         # Remove _DISABLED below to include currency conversions. This won't work as expected since
@@ -43,28 +44,31 @@ class Importer(xlsreader.Importer, banking.Importer):
 
     def deep_identify(self, file):
         account_number = self.config.get('account_number', '')
-        return re.match(self.header_identifier, file.head()) and \
+        return self.header_regex.match(file.head()) and \
             account_number in file.head()
 
     # TODO: move into utils, since this is probably a common operation
     def prepare_table(self, rdr):
+        transform = transforms.Transform()
         # Remove carriage returns in description
-        rdr = rdr.convert('Description', lambda x: x.replace('\n', ' '))
-        rdr = rdr.addfield('memo', lambda x: '')
+        transform.convert('Description', lambda x: x.replace('\n', ' '))
+        transform.addfield('memo', '')
 
         # delete empty rows
-        rdr = rdr.select(lambda x: x['Transaction Date'] != '')
-        return rdr
+        transform.select(lambda x: x['Transaction Date'] != '')
+        return transform.apply(rdr)
 
     def prepare_processed_table(self, rdr):
-        return rdr.convert('amount', lambda x: -1 * D(x))
+        return transforms.Transform().negate('amount').apply(rdr)
 
     def prepare_raw_file(self, rdr):
+        transform = transforms.Transform()
         # Strip tabs and spaces around each field in the entire file
-        rdr = rdr.convertall(lambda x: x.strip(' \t') if isinstance(x, str) else x)
+        transform.strip(' \t')
 
         # Delete empty rows
-        rdr = rdr.select(lambda x: any([i != '' for i in x]))
+        transform.select(lambda x: any([i != '' for i in x]))
+        rdr = transform.apply(rdr)
 
         return rdr
 
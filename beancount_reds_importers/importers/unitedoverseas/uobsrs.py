@@ -1,9 +1,9 @@
 """UOB SRS importer."""
 
-import re
+from beancount_reds_importers.libreader import amounts
+from beancount_reds_importers.libreader import transforms
 from beancount_reds_importers.libreader import xlsreader
 from beancount_reds_importers.libtransactionbuilder import banking
-from beancount.core.number import D
 
 
 class Importer(xlsreader.Importer, banking.Importer):
@@ -24,23 +24,25 @@ class Importer(xlsreader.Importer, banking.Importer):
 
     def deep_identify(self, file):
         account_number = self.config.get('account_number', '')
-        return re.match(self.header_identifier, file.head()) and \
+        return self.header_regex.match(file.head()) and \
             account_number in file.head()
 
     def prepare_table(self, rdr):
+        transform = transforms.Transform()
         # Remove carriage returns in description
-        rdr = rdr.convert('Transaction Description', lambda x: x.replace('\n', ' '))
+        transform.convert('Transaction Description', lambda x: x.replace('\n', ' '))
 
-        rdr = rdr.addfield('amount',
-                           lambda x: -1 * D(x['Withdrawal']) if x['Withdrawal'] != '' else D(x['Deposit']))
-        rdr = rdr.addfield('memo', lambda x: '')
-        return rdr
+        transform.addfield('amount', lambda x: amounts.debit_credit(x['Withdrawal'], x['Deposit']))
+        transform.addfield('memo', '')
+        return transform.apply(rdr)
 
     def prepare_raw_file(self, rdr):
+        transform = transforms.Transform()
         # Strip tabs and spaces around each field in the entire file
-        rdr = rdr.convertall(lambda x: x.strip(' \t') if isinstance(x, str) else x)
+        transform.strip(' \t')
 
         # Delete empty rows
-        rdr = rdr.select(lambda x: any([i != '' for i in x]))
+        transform.select(lambda x: any([i != '' for i in x]))
+        rdr = transform.apply(rdr)
 
         return rdr
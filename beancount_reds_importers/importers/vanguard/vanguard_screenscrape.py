@@ -1,6 +1,8 @@
 """ Vanguard screenscrape importer. Unsettled trades are not available in Vanguard's qfx and need to be
 screenscrapped into a tsv"""
 
+from beancount_reds_importers.libreader import amounts
+from beancount_reds_importers.libreader import transforms
 from beancount_reds_importers.libreader import tsvreader
 from beancount_reds_importers.libtransactionbuilder import investments
 
@@ -35,25 +37,19 @@ class Importer(investments.Importer, tsvreader.Importer):
 
     def prepare_table(self, rdr):
         def extract_numbers(x):
-            replacements = {'– ': '-',
-                            '$': '',
-                            ',': '',
-                            'Free': '0',
-                            }
-            for k, v in replacements.items():
-                x = x.replace(k, v)
-            return x
+            return amounts.parse(x.replace('Free', '0'))
 
         header = ('date', 'settledate', 'symbol', 'description', 'quantity', 'price', 'fees', 'amount')
         rdr = rdr.pushheader(header)
 
-        rdr = rdr.addfield('action', lambda x: x['description'].rsplit(' ', 2)[1].strip())
+        transform = transforms.Transform()
+        transform.addfield('action', lambda x: x['description'].rsplit(' ', 2)[1].strip())
 
         for field in ["date", "settledate", "symbol", "description", "quantity", "price", "fees"]:
-            rdr = rdr.convert(field, lambda x: x.strip())
+            transform.convert(field, lambda x: x.strip())
         for field in ["quantity", "amount", "price", "fees"]:
-            rdr = rdr.convert(field, extract_numbers)
+            transform.convert(field, extract_numbers)
 
-        rdr = rdr.addfield('total', lambda x: x['amount'])
+        transform.addfield('total', lambda x: x['amount'])
 
-        return rdr
+        return transform.apply(rdr)
@@ -1,6 +1,6 @@
 """ Workday paycheck importer."""
 
-import datetime
+from beancount_reds_importers.libreader import dates
 from beancount_reds_importers.libreader import xlsx_multitable_reader
 from beancount_reds_importers.libtransactionbuilder import paycheck
 
@@ -26,6 +26,7 @@ class Importer(paycheck.Importer, xlsx_multitable_reader.Importer):
         # TODO: need to be smarter about this, and skip only when needed
         self.skip_tail_rows = 0
         self.funds_db_txt = 'funds_by_ticker'
+        self.extra_fields = ['check_date']  # see paycheck_date()
         self.header_map = {
             "Description": 'memo',
             "Symbol":      'security',
@@ -34,19 +35,24 @@ class Importer(paycheck.Importer, xlsx_multitable_reader.Importer):
             }
 
     def paycheck_date(self, input_file):
-        self.read_file(input_file)
-        d = self.alltables['Payslip Information'].namedtuples()[0].check_date
-        self.date = datetime.datetime.strptime(d, self.date_format)
+        d = None
+        if not self.file_read_done:
+            # avoid reading the entire file: the date is in the first section
+            header, row = self.get_section_head(input_file, 'Payslip Information')
+            if header and row:
+                d = dict(zip([self.valid_header_label(h) for h in header], row)).get('check_date')
+        if not d:
+            self.read_file(input_file)
+            d = self.alltables['Payslip Information'].namedtuples()[0].check_date
+        self.date = dates.parse(d, self.date_format)
         return self.date.date()
 
-    def prepare_tables(self):
-        def valid_header_label(label):
-            return label.lower().replace(' ', '_')
+    @staticmethod
+    def valid_header_label(label):
+        return label.lower().replace(' ', '_')
 
-        for section, table in self.alltables.items():
-            for header in table.header():
-                table = table.rename(header, valid_header_label(header))
-            self.alltables[section] = table
+    def prepare_section(self, section, table):
+        return table.rename({header: self.valid_header_label(header) for header in table.header()})
 
     def build_metadata(self, file, metatype=None, data={}):
         return {'filing_account': self.config['main_account']}
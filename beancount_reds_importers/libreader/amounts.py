@@ -0,0 +1,102 @@
+"""Parsing of money amounts found in statements, for the readers and importers in beancount_reds_importers."""
+
+import re
+from decimal import Decimal
+
+# Amounts show up in statements in many forms:
+#   '$1,234.56'  '-$5.00'  '$-5.00'  'SGD 141.02 CR'  '141.02 DR'  '(5.00)'  '– 5.00'  '5.00-'  'USD 10'
+#
+# tokenize() takes these apart in a single regex match (after dropping whitespace), into a sign, the digits,
+# and the currency, and parse() turns that into a Decimal. Signs:
+#   - a leading or trailing minus, including unicode dashes (eg: '–', '−'), is negative
+#   - parentheses around the amount are negative
+#   - a 'DR' (debit) suffix is negative, and a 'CR' (credit) suffix is positive
+# An odd number of these makes the amount negative. Commas are thousands separators, as in beancount's D().
+#
+# minor_units() returns the amount as an integer number of minor units (eg: cents), without going through
+# Decimal at all, for callers that want to do exact integer arithmetic on amounts.
+
+MINUS_SIGNS = '-‐‑‒–—―−﹣－'
+MINUS_TRANSLATION = str.maketrans({c: '-' for c in MINUS_SIGNS})
+
+# a currency is letters ('SGD'), a symbol ('$'), or both ('S$')
+CURRENCY = rf'[^\W\d_]*[^\w\s().,+{MINUS_SIGNS}]?'
+
+AMOUNT_RE = re.compile(rf'''
+    (?P<open>\()?
+    (?P<sign>[+-])?
+    (?P<prefix>{CURRENCY})
+    (?P<sign2>[+-])?
+    (?P<integer>\d[\d,]*)?
+    (?:\.(?P<fraction>\d*))?
+    (?:(?P<crdr>(?i:CR|DR))|(?P<suffix>{CURRENCY}))
+    (?P<trailing>-)?
+    (?P<close>\))?
+''', re.VERBOSE)
+
+
+def tokenize(s):
+    """Split an amount string into (negative, integer digits, fraction digits, currency). fraction digits is
+    None if there is no decimal point, and currency is None if there is none. Returns None if s is not an
+    amount."""
+    s = ''.join(s.split()).translate(MINUS_TRANSLATION)
+    m = AMOUNT_RE.fullmatch(s)
+    if not m:
+        return None
+    integer, fraction = m.group('integer'), m.group('fraction')
+    if not integer and not fraction:
+        return None
+    if bool(m.group('open')) != bool(m.group('close')):
+        return None
+    if m.group('prefix') and m.group('suffix') or m.group('sign') and m.group('sign2'):
+        return None
+
+    negative = (m.group('sign') == '-') ^ (m.group('sign2') == '-') ^ bool(m.group('trailing')) ^ \
+        bool(m.group('open')) ^ (m.group('crdr') is not None and m.group('crdr').upper() == 'DR')
+    integer = integer.replace(',', '') if integer else '0'
+    return negative, integer, fraction, m.group('prefix') or m.group('suffix') or None
+
+
+def parse(x):
+    """Parse an amount into a Decimal. Like beancount's D(), Decimals are returned as is, numbers are converted,
+    and None or an empty string is zero. Raises ValueError if x is not an amount."""
+    if isinstance(x, Decimal):
+        return x
+    if x is None or x == '':
+        return Decimal()
+    if isinstance(x, (int, float)):
+        return Decimal(x)
+    tokens = tokenize(x)
+    if tokens is None:
+        if not x.strip():
+            return Decimal()
+        raise ValueError(f"Not an amount: {x!r}")
+    negative, integer, fraction, _ = tokens
+    number = integer if fraction is None else f'{integer}.{fraction}'
+    return Decimal('-' + number if negative else number)
+
+
+def currency(x):
+    """Return the currency in an amount string (eg: 'SGD' in 'SGD 141.02 CR'), or None"""
+    tokens = tokenize(x)
+    return tokens[3] if tokens else None
+
+
+def minor_units(x, places=2):
+    """Parse an amount into an integer number of minor units, eg: '$-1,234.5' is -123450 cents. Raises
+    ValueError if x is not an amount, or has more than places digits after the decimal point."""
+    tokens = tokenize(x)
+    if tokens is None:
+        raise ValueError(f"Not an amount: {x!r}")
+    negative, integer, fraction, _ = tokens
+    fraction = (fraction or '').rstrip('0')
+    if len(fraction) > places:
+        raise ValueError(f"Amount {x!r} has more than {places} decimal places")
+    units = int(integer + fraction.ljust(places, '0'))
+    return -units if negative else units
+
+
+def debit_credit(debit, credit):
+    """Amount for statements with separate debit (withdrawal) and credit (deposit) columns, only one of which
+    is filled in on each row"""
+    return -parse(debit) if debit != '' else parse(credit)
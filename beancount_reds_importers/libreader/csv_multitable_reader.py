@@ -1,7 +1,10 @@
 """csv importer module for beancount to be used along with investment/banking/other importer modules in
 beancount_reds_importers."""
 
+import collections.abc
+import itertools
 from beancount_reds_importers.libreader import csvreader
+from beancount_reds_importers.libreader import table
 
 # This is a reader that converts:
 # ---- examples.csv -----
@@ -27,6 +30,19 @@ from beancount_reds_importers.libreader import csvreader
 # The reader assumes that any line with a single field marks the beginning of a new section, with that field
 # as the title of the section. The next line is assumed to be the header for that new section.
 #
+# Importers often only need a few of the sections. So self.alltables is a LazySections: the file is scanned for
+# section titles in a single pass (see scan_sections()), but each section is only built when it is first
+# accessed, and then kept. Building a section:
+#   - cleans it up: drops empty rows, and columns with an empty header (see clean_section())
+#   - prepare_section(section, rdr): for importers to override, eg: to rename or convert columns
+#   - filters its rows (see rowfilter.py), if it has the filtered fields (eg: 'date' or 'security')
+#   - drops unused columns, with 'project_columns': True in the config: transaction builders that read sections
+#     (eg: paycheck) declare the fields they use in SECTION_FIELDS (see reader.used_fields()). Importers list
+#     fields they use themselves in self.extra_fields
+# So importers should go over the sections they need by title, rather than over all of self.alltables.items().
+# prepare_tables() is called once per file, before any section is built. Tables it sets in self.alltables are
+# used as they are.
+#
 # This file format is common enough to warrant this reader.
 # The xlsx_multitable reader is built on top of this reader
 
@@ -44,46 +60,105 @@ class Importer(csvreader.Importer):
     def convert_columns(self, rdr):
         pass
 
+    def compile_reader(self):
+        super().compile_reader()
+        self.section_fields = self.used_fields(getattr(self, 'SECTION_FIELDS', None))
+
+    def cutout_unused_columns(self, rdr):
+        """Drop the columns of a section that no one uses (see the top of this file)"""
+        if self.section_fields is None:
+            return rdr
+        return table.cutout_columns(rdr, [f for f in rdr.header() if f not in self.section_fields])
+
     def is_section_title(self, row):
         # Match against rows that contain section titles. Eg: 'section1', 'section2', ...
         return len(row) == 1
 
+    def get_section_head(self, file, section):
+        """Return the header and first row of a section, reading only as much of the file as needed. Returns
+        (None, None) if the section is not found."""
+        rows = itertools.islice(self.iter_raw_rows(file), getattr(self, 'skip_head_rows', 0), None)
+        for row in rows:
+            if row and row[0] == section and self.is_section_title(row):
+                return next(rows, None), next(rows, None)
+        return None, None
+
+    def prepare_tables(self):
+        """For importers to override. Called once per file, before any section is built"""
+        pass
+
+    def prepare_section(self, section, rdr):
+        """For importers to override, to clean up the table of a section. Called when the section is first
+        accessed (see the top of this file)"""
+        return rdr
+
     def read_file(self, file):
         # read csv
         # identify and separate out tables
-        # clean up each table
+        # clean up each table, when it is first accessed
         # output is in self.alltables
 
         if self.file_read_done:
             return
 
-        self.raw_rdr = rdr = self.read_raw(file)
+        if getattr(self, 'row_cache', None):
+            # see row_cache.py. The cache holds all sections, but they are still prepared on demand
+            tables = self.row_cache.get(self, file, lambda: {k: v.to_rows() for k, v in self.read_tables(file).items()})
+            raw_tables = LazySections(tables, lambda section: table.MaterializedTable(tables[section]))
+        else:
+            raw_tables = self.read_tables(file)
+
+        self.summary = None
+        self.alltables = LazySections(raw_tables, lambda section: self.build_section(section, raw_tables[section]))
+        self.prepare_tables()  # to be overridden by importer
+        self.file_read_done = True
+
+    def build_section(self, section, rdr):
+        rdr = self.prepare_section(section, rdr)  # to be overridden by importer
+        return self.cutout_unused_columns(self.filter_rows(table.materialize(rdr)))
+
+    @property
+    def raw_rdr(self):
+        return self.get_raw_table(self.file)
+
+    def read_tables(self, file):
+        """Return a LazySections of the sections of file, cleaned up (see clean_section()) when first accessed"""
+        rdr = self.get_raw_table(file)
 
         rdr = rdr.skip(getattr(self, 'skip_head_rows', 0))                 # chop unwanted file header rows
         rdr = rdr.head(len(rdr) - getattr(self, 'skip_tail_rows', 0) - 1)  # chop unwanted file footer rows
 
-        #     [0, 2, 10] <-- starts
-        # [-1, 1, 9]     <-- ends
-        table_starts = [i for (i, row) in enumerate(rdr) if self.is_section_title(row)] + [len(rdr)]
-        table_ends = [r-1 for r in table_starts][1:]
-        table_indexes = zip(table_starts, table_ends)
-
-        # build the dictionary of tables
-        self.alltables = {}
-        for (s, e) in table_indexes:
-            if s == e:
-                continue
-            table = rdr.skip(s+1)      # skip past start index and header row
-            table = table.head(e-s-1)  # chop lines after table section data
-            self.alltables[rdr[s][0]] = table
-
-        for section, table in self.alltables.items():
-            table = table.rowlenselect(0, complement=True)  # clean up empty rows
-            table = table.cut(*[h for h in table.header() if h])  # clean up empty columns
-            self.alltables[section] = table
-
-        self.prepare_tables()  # to be overridden by importer
-        self.file_read_done = True
+        rows = list(rdr)
+        offsets = self.scan_sections(rows)
+        return LazySections(offsets, lambda section: self.clean_section(rows[slice(*offsets[section])]))
+
+    def scan_sections(self, rows):
+        """Return a dict of section title to the (start, end) offsets in rows of the section's header and data
+        rows, found in a single pass over rows. Rows before the first section title are ignored, as are sections
+        with no rows at all."""
+        offsets = {}
+        title = start = None
+        for n, row in enumerate(rows):
+            if self.is_section_title(row):
+                if start is not None and n > start:
+                    offsets[title] = (start, n)
+                title, start = row[0], n + 1
+        if start is not None and len(rows) > start:
+            offsets[title] = (start, len(rows))
+        return offsets
+
+    @staticmethod
+    def clean_section(rows):
+        """Table of a section's rows (the first of which is its header), without empty rows, and without columns
+        that have an empty header"""
+        header = tuple(rows[0])
+        keep = [header.index(h) for h in header if h]  # same as petl's cut(): the first of duplicate fields
+        rows = [row for row in rows[1:] if len(row)]
+        if keep == list(range(len(header))):
+            return table.MaterializedTable([header] + rows)
+        # like petl's cut(), cells missing from short rows are None
+        return table.MaterializedTable([tuple(header[i] for i in keep)] +
+                                       [tuple(row[i] if i < len(row) else None for i in keep) for row in rows])
 
     def get_transactions(self):
         # TODO, remove
@@ -96,3 +171,36 @@ class Importer(csvreader.Importer):
 
     def get_available_cash(self, settlement_fund_balance=0):
         return None
+
+
+class LazySections(collections.abc.MutableMapping):
+    """A dict of section title to table, that builds each table (via build(title)) only when it is first
+    accessed, and then keeps it. Iterating over titles, or checking for one, doesn't build anything."""
+    def __init__(self, titles, build):
+        self.titles = dict.fromkeys(titles)  # in the order of the file
+        self.build = build
+        self.tables = {}
+
+    def __getitem__(self, title):
+        if title not in self.tables:
+            if title not in self.titles:
+                raise KeyError(title)
+            self.tables[title] = self.build(title)
+        return self.tables[title]
+
+    def __setitem__(self, title, rdr):
+        self.titles[title] = None
+        self.tables[title] = rdr
+
+    def __delitem__(self, title):
+        del self.titles[title]
+        self.tables.pop(title, None)
+
+    def __contains__(self, title):
+        return title in self.titles
+
+    def __iter__(self):
+        return iter(list(self.titles))
+
+    def __len__(self):
+        return len(self.titles)
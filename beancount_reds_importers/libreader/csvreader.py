@@ -1,13 +1,20 @@
 """csv importer module for beancount to be used along with investment/banking/other importer modules in
 beancount_reds_importers."""
 
-import datetime
+import csv
+import functools
 import re
 import traceback
+from decimal import Decimal
 from beancount.ingest import importer
 from beancount.core.number import D
 import petl as etl
+from beancount_reds_importers.libreader import dates
+from beancount_reds_importers.libreader import filebuffer
 from beancount_reds_importers.libreader import reader
+from beancount_reds_importers.libreader import rowfilter
+from beancount_reds_importers.libreader import statement_cache
+from beancount_reds_importers.libreader import table
 import sys
 
 # This csv reader uses petl to read a .csv into a table for maniupulation. The output of this reader is a list
@@ -54,8 +61,78 @@ import sys
 #             }
 #
 #   - numbers are parsed from string and convered into Decimal type. Non-numeric characters like '$' are removed.
-#   - dates are parsed and converted into datetime type.
+#     Accounting notation, eg: '(5.00)' or '5.00 DR', is not read as negative: importers whose files use it parse
+#     those columns themselves in prepare_table(), via amounts.py.
+#   - dates are parsed and converted into datetime type (see dates.py).
 # - The table is now ready for use by the importer. petl makes each row available via namedtuples
+#
+# The raw table, and the final table, are materialized (see table.py): the file is parsed and each of the steps
+# above run exactly once, no matter how many times the importer then goes over self.rdr.
+#
+# Besides the main table, files often contain auxiliary regions, such as a balance. Importers declare these in
+# custom_init(), and they are collected in a single scan of the file (after prepare_raw_file()):
+#   - self.row_labels = ['Current Balance']: rows whose first cell is one of these labels. Available via
+#     get_row_by_label()
+#   - self.secondary_table_labels = {'balance': 'Account Name,Currency,Current Balance'}: tables, keyed by a
+#     name, with a header containing these column labels, up to the next blank line. Available via
+#     get_secondary_table()
+#
+# Streaming mode: for very large files, set 'csv_streaming': True in the importer's config. The file is then
+# read from disk as the table is iterated, and self.rdr is a lazy table: footer rows (skip_tail_rows) are
+# dropped via a ring buffer, and columns are converted a chunk of rows at a time (see table.py), so that memory
+# is bounded by those, rather than by the size of the file. Each pass over self.rdr re-reads the file, so
+# get_transactions() builds the statement summary along the way. Importers that index into self.rdr (eg:
+# self.rdr.namedtuples()[-1]) need the default, materialized mode. The row cache isn't used when streaming.
+#
+# Parallel conversion: set 'csv_processes': <n> in the importer's config to convert the columns of files with at
+# least 'csv_parallel_min_rows' rows (default: PARALLEL_MIN_ROWS) in n worker processes. The main table is split
+# into chunks of rows after it has been extracted, and the converted chunks are put back together in order, so
+# the result is identical to converting serially.
+#
+# Column projection: set 'project_columns': True in the importer's config to only read the fields that are used.
+# Transaction builders declare the fields they use (TRANSACTION_FIELDS, see reader.used_fields()). Columns that
+# header_map renames to any other field are then dropped right after renaming, and only used fields are
+# converted, so that unused money and date columns cost nothing. Columns header_map doesn't rename are kept as
+# is. Importers that read other fields from self.rdr in their own hooks list them in self.extra_fields, or else
+# those fields are missing (or left unconverted) when projection is on.
+#
+# Filters: rows can be filtered by date, type and security (see rowfilter.py). The filter is applied right after
+# header_map renames columns (and after unused ones are dropped), to the raw values, so rows that are filtered
+# out are never converted. Importers that use the default skip_transaction() have their skip_transaction_types
+# filtered out this way too, unless they set self.filter_skip_transaction_types = False (eg: because they read
+# those rows from self.rdr themselves).
+#
+# Header rows (of the main and secondary tables) are the first row that contains all the column labels. Set
+# self.header_last_match = True for files that repeat the header, to use the last one instead.
+
+NON_NUMERIC_RE = re.compile(r'[^0-9\.-]')
+
+# files with fewer rows than this are converted serially, even if 'csv_processes' is set
+PARALLEL_MIN_ROWS = 50000
+
+
+def currency_to_decimal(x):
+    """Parse a currency amount, ignoring non-numeric characters like '$'"""
+    if isinstance(x, Decimal):
+        return x
+    x = NON_NUMERIC_RE.sub('', str(x))
+    return Decimal(x) if x else Decimal()
+
+
+def convert_types(type_map, col):
+    return [type_map[v] if v in type_map else v for v in col]
+
+
+def convert_decimals(col):
+    return table.convert_values(D, col)
+
+
+def convert_currencies(col):
+    return table.convert_values(currency_to_decimal, col)
+
+
+def convert_dates(date_format, col):
+    return table.convert_values(dates.parser(date_format), col)
 
 
 class Importer(reader.Reader, importer.ImporterProtocol):
@@ -71,14 +148,34 @@ class Importer(reader.Reader, importer.ImporterProtocol):
             #     print("header_identifier failed---------------:")
             #     print(self.header_identifier, file.head())
 
+    def compile_reader(self):
+        if hasattr(self, 'header_identifier'):
+            self.header_regex = re.compile(self.header_identifier, getattr(self, 'header_identifier_flags', 0))
+        if hasattr(self, 'column_labels_line'):
+            self.column_labels = self.column_labels_line.replace('"', '').split(',')
+        self.secondary_column_labels = {name: line.replace('"', '').split(',')
+                                        for name, line in getattr(self, 'secondary_table_labels', {}).items()}
+        self.transaction_fields = self.used_fields(getattr(self, 'TRANSACTION_FIELDS', None))
+
+        skip_types = []
+        if type(self).skip_transaction is Importer.skip_transaction and \
+                getattr(self, 'filter_skip_transaction_types', True):
+            skip_types = getattr(self, 'skip_transaction_types', [])
+        self.row_filter = rowfilter.from_importer(self, skip_types)
+
     def deep_identify(self, file):
-        return re.match(self.header_identifier, file.head())
+        return self.header_regex.match(file.head())
 
     def file_date(self, file):
         "Get the maximum date from the file."
         self.initialize(file)  # self.date_format gets set via this
         self.read_file(file)
-        return max(ot.date for ot in self.get_transactions()).date()
+        summary = self.get_summary()
+        if summary.date_error is not None:
+            raise summary.date_error
+        if summary.max_date is None:
+            raise ValueError(f"No transactions found in {file.name}")
+        return summary.max_date.date()
 
     def prepare_table(self, rdr):
         return rdr
@@ -94,101 +191,225 @@ class Importer(reader.Reader, importer.ImporterProtocol):
     def prepare_processed_table(self, rdr):
         return rdr
 
+    def cutout_unused_columns(self, rdr):
+        """Drop the columns that header_map renames to fields no one uses (see the top of this file)"""
+        if self.transaction_fields is None:
+            return rdr
+        return table.cutout_columns(rdr, set(self.header_map.values()) - self.transaction_fields)
+
+    def filter_rows(self, rdr):
+        """Drop the rows the filter rejects (see the top of this file), from their raw values"""
+        if self.row_filter.is_empty():
+            return rdr
+        date_format = getattr(self, 'date_format', None)
+        predicate = self.row_filter.row_predicate(rdr.header(), dates.parser(date_format) if date_format else None,
+                                                  getattr(self, 'transaction_type_map', {}))
+        return rdr if predicate is None else table.select_rows(rdr, predicate)
+
     def convert_columns(self, rdr):
+        # Columns are converted a whole column at a time (see table.convert_columns()), with the same results as
+        # converting each cell via petl's convert(): cells that fail to convert become None
+        # (converters are partials of module level functions, so that they can be sent to worker processes)
+        converters = []
+
         # convert data in transaction types column
         if 'type' in rdr.header():
-            rdr = rdr.convert('type', self.transaction_type_map)
+            converters.append(('type', functools.partial(convert_types, self.transaction_type_map)))
 
         # fixup decimals
         decimals = ['units']
         for i in decimals:
-            if i in rdr.header():
-                rdr = rdr.convert(i, D)
+            converters.append((i, convert_decimals))
 
         # fixup currencies
-        def remove_non_numeric(x):
-            return re.sub("[^0-9\.-]", "", str(x).strip())  # noqa: W605
         currencies = getattr(self, 'currency_fields', []) + ['unit_price', 'fees', 'total', 'amount', 'balance']
         for i in currencies:
-            if i in rdr.header():
-                rdr = rdr.convert(i, remove_non_numeric)
-                rdr = rdr.convert(i, D)
+            converters.append((i, convert_currencies))
 
         # fixup dates
-        def convert_date(d):
-            return datetime.datetime.strptime(d, self.date_format)
-        dates = getattr(self, 'date_fields', []) + ['date', 'tradeDate', 'settleDate']
-        for i in dates:
-            if i in rdr.header():
-                rdr = rdr.convert(i, convert_date)
+        date_fields = getattr(self, 'date_fields', []) + ['date', 'tradeDate', 'settleDate']
+        for i in date_fields:
+            converters.append((i, functools.partial(convert_dates, getattr(self, 'date_format', None))))
 
-        return rdr
+        # only convert the fields that are used (see the top of this file), and the ones the importer asks for
+        if self.transaction_fields is not None:
+            used = self.transaction_fields.union(getattr(self, 'currency_fields', []), getattr(self, 'date_fields', []))
+            converters = [(f, convert) for f, convert in converters if f in used]
+
+        # large files can optionally be converted in parallel (see table.convert_columns_parallel())
+        processes = self.config.get('csv_processes', 0)
+        if processes and not self.config.get('csv_streaming', False):
+            rdr = table.materialize(rdr)
+            if len(rdr.rows) >= self.config.get('csv_parallel_min_rows', PARALLEL_MIN_ROWS):
+                return table.convert_columns_parallel(rdr, converters, processes)
+        return table.convert_columns(rdr, converters)
 
     def read_raw(self, file):
+        return etl.fromcsv(filebuffer.petl_source(file.name))
+
+    def get_raw_table(self, file):
+        """Return the table read by read_raw(). The table is read once per file, and shared by all importer
+        instances that use the same read_raw() (see statement_cache.py)."""
+        return statement_cache.get(file.name, type(self).read_raw, lambda: table.materialize(self.read_raw(file)))
+
+    def read_raw_stream(self, file):
+        """Like read_raw(), but reads from the file on disk as the table is iterated, without holding the whole
+        file in memory. Used in streaming mode."""
         return etl.fromcsv(file.name)
 
+    def iter_raw_rows(self, file):
+        """Iterate over the raw rows of the file (lists of strings), parsing only as much of the file as is
+        consumed. Useful to get metadata (eg: statement dates) found at the top of a file, without parsing the
+        entire file."""
+        with filebuffer.open_text(file.name, newline='') as f:
+            yield from csv.reader(f)
+
+    def find_header_row(self, rdr, col_labels, last_match=None):
+        """Return the offset of the row in rdr that contains all of col_labels, or None if there is none. This
+        is the first such row, and the scan stops there, unless last_match (default: self.header_last_match) is
+        set, in which case it is the last such row."""
+        if last_match is None:
+            last_match = getattr(self, 'header_last_match', False)
+        # We only check if each element in col_labels shows up in the line in the file, and not
+        # the other way around. This allows additional fields to show up anywhere, case the csv
+        # format changes
+        labels = set(col_labels)
+        found = None
+        for n, r in enumerate(rdr):
+            if labels.issubset(r):
+                if not last_match:
+                    return n
+                found = n
+        return found
+
     def skip_until_main_table(self, rdr, col_labels=None):
         """Skip csv lines until the header line is found."""
         # TODO: convert this into an 'extract_table()' method that handles the tail as well
         if not col_labels:
-            if hasattr(self, 'column_labels_line'):
-                col_labels = self.column_labels_line.replace('"', '').split(',')
+            if hasattr(self, 'column_labels'):
+                col_labels = self.column_labels
             else:
                 return rdr
-        skip = None
-        for n, r in enumerate(rdr):
-            # We only check if each element in col_labels shows up in the line in the file, and not
-            # the other way around. This allows additional fields to show up anywhere, case the csv
-            # format changes
-            if all(i in list(r) for i in col_labels):
-                skip = n
+        skip = self.find_header_row(rdr, col_labels)
         if skip is None:
             print("Error: expected columns not found:")
             print(col_labels)
             sys.exit(1)
         return rdr.skip(skip)
 
+    @staticmethod
+    def is_blank_row(row):
+        return not row or all(i == '' for i in row)
+
+    def scan_regions(self, rdr):
+        """Collect the labelled rows and secondary tables declared by the importer (see the top of this file)
+        from rdr, in a single pass"""
+        labels = set(getattr(self, 'row_labels', []))
+        last_match = getattr(self, 'header_last_match', False)
+        self.labelled_rows = {}
+        self.secondary_tables = {}
+        if not labels and not self.secondary_column_labels:
+            return
+
+        table_labels = {name: set(col_labels) for name, col_labels in self.secondary_column_labels.items()}
+        collecting = {}  # rows of secondary tables whose header was found, up to the next blank line
+        for row in rdr:
+            row = tuple(row)
+            if row and row[0] in labels and row[0] not in self.labelled_rows:
+                self.labelled_rows[row[0]] = row
+            for name in list(collecting):
+                if self.is_blank_row(row):
+                    self.secondary_tables[name] = table.MaterializedTable(collecting.pop(name))
+                else:
+                    collecting[name].append(row)
+            for name, col_labels in table_labels.items():
+                # same as find_header_row()
+                found = name in collecting or name in self.secondary_tables
+                if col_labels.issubset(row) and (last_match or not found):
+                    collecting[name] = [row]
+            if not last_match and not collecting and len(self.labelled_rows) == len(labels) and \
+                    len(self.secondary_tables) == len(table_labels):
+                break  # found everything
+
+        for name, rows in collecting.items():
+            self.secondary_tables[name] = table.MaterializedTable(rows)
+
     def extract_table_with_header(self, rdr, col_labels=None):
         rdr = self.skip_until_main_table(rdr, col_labels)
+        if not isinstance(rdr, table.MaterializedTable):
+            # streaming: stop at the first blank line, without counting rows
+            return table.HeadUntilView(rdr, self.is_blank_row)
         nrows = len(rdr)
         for (n, r) in enumerate(rdr):
-            if not r or all(i == '' for i in r):
+            if self.is_blank_row(r):
                 # blank line, terminate
                 nrows = n - 1
                 break
         rdr = rdr.head(nrows)
         return rdr
 
-    def read_file(self, file):
-        if not self.file_read_done:
+    def read_table(self, file):
+        streaming = self.config.get('csv_streaming', False)
 
-            # read file
-            rdr = self.read_raw(file)
-            rdr = self.prepare_raw_file(rdr)
+        # read file
+        if streaming:
+            rdr = self.prepare_raw_file(self.read_raw_stream(file))
+        else:
+            rdr = self.get_raw_table(file)
+            rdr = table.materialize(self.prepare_raw_file(rdr))
+        self.scan_regions(rdr)
 
-            # extract main table
-            rdr = rdr.skip(getattr(self, 'skip_head_rows', 0))                 # chop unwanted header rows
+        # extract main table
+        rdr = rdr.skip(getattr(self, 'skip_head_rows', 0))                     # chop unwanted header rows
+        if streaming:
+            rdr = table.DropTailView(rdr, getattr(self, 'skip_tail_rows', 0))   # chop unwanted footer rows
+        else:
             rdr = rdr.head(len(rdr) - getattr(self, 'skip_tail_rows', 0) - 1)  # chop unwanted footer rows
-            rdr = self.extract_table_with_header(rdr)
-            if hasattr(self, 'skip_comments'):
-                rdr = rdr.skipcomments(self.skip_comments)
-            rdr = rdr.rowslice(getattr(self, 'skip_data_rows', 0), None)
-            rdr = self.prepare_table(rdr)
-
-            # process table
-            rdr = rdr.rename(self.header_map)
-            rdr = self.convert_columns(rdr)
-            rdr = self.fix_column_names(rdr)
-            rdr = self.prepare_processed_table(rdr)
-            self.rdr = rdr
+        rdr = self.extract_table_with_header(rdr)
+        if hasattr(self, 'skip_comments'):
+            rdr = rdr.skipcomments(self.skip_comments)
+        rdr = rdr.rowslice(getattr(self, 'skip_data_rows', 0), None)
+        rdr = self.prepare_table(rdr)
+
+        # process table
+        rdr = rdr.rename(self.header_map)
+        rdr = self.cutout_unused_columns(rdr)
+        rdr = self.filter_rows(rdr)
+        rdr = self.convert_columns(rdr)
+        rdr = self.fix_column_names(rdr)
+        rdr = self.prepare_processed_table(rdr)
+        return rdr if streaming else table.materialize(rdr)
+
+    def read_file(self, file):
+        if not self.file_read_done:
+            if self.config.get('csv_streaming', False):
+                self.rdr = self.read_table(file)
+            elif getattr(self, 'row_cache', None):
+                # see row_cache.py. The regions found by scan_regions() are cached along with the table
+                def read():
+                    rows = self.read_table(file).to_rows()
+                    return rows, self.labelled_rows, {k: v.to_rows() for k, v in self.secondary_tables.items()}
+                rows, self.labelled_rows, tables = self.row_cache.get(self, file, read)
+                self.rdr = table.MaterializedTable(rows)
+                self.secondary_tables = {k: table.MaterializedTable(v) for k, v in tables.items()}
+            else:
+                self.rdr = self.read_table(file)
+            self.summary = None
             self.ifile = file
             self.file_read_done = True
 
     def get_transactions(self):
+        # build the summary (see reader.py) along the way, to save a pass over the table, which matters when
+        # streaming
+        summary = reader.StatementSummary([]) if self.summary is None else None
         for ot in self.rdr.namedtuples():
             if self.skip_transaction(ot):
                 continue
+            if summary is not None:
+                summary.add(ot)
             yield ot
+        if summary is not None:
+            self.summary = summary
 
     def get_available_cash(self, settlement_fund_balance=0):
         return None
@@ -206,9 +427,11 @@ class Importer(reader.Reader, importer.ImporterProtocol):
             # do a download in the future, and cause the balance assertions to be invalid.
 
             # TODO: clean this up. this probably suffices:
-            # return max(ot.date for ot in self.get_transactions()).date()
-            date = max(ot.tradeDate if hasattr(ot, 'tradeDate') else ot.date
-                       for ot in self.get_transactions()).date()
+            # return self.get_summary().max_date.date()
+            summary = self.get_summary()
+            if summary.date_error is not None:
+                raise summary.date_error
+            date = summary.max_trade_date.date()
         except Exception as err:
             print(f"ERROR: no end_date. SKIPPING {self.file.name} input.", file=sys.stderr)
             traceback.print_tb(err.__traceback__, file=sys.stderr)
@@ -220,9 +443,22 @@ class Importer(reader.Reader, importer.ImporterProtocol):
         """Return a row from file where the first cell (column) matches label. This is a common
         operation in csv files, and is thus provided here as a utility. Eg:
            "Account Statement:,123456,EUR"
+        Labels declared in self.row_labels are found while reading the file, without another pass over it.
         """
-        # Read from scratch, as we don't want to throw away headers or footers, which is where our
+        if getattr(self, 'ifile', None) == file and label in getattr(self, 'labelled_rows', {}):
+            return self.labelled_rows[label]
+
+        # Start from the raw table, as we don't want to throw away headers or footers, which is where our
         # label is likely to be found
-        rdr = self.read_raw(file)
+        rdr = self.get_raw_table(file)
         rdr = self.prepare_raw_file(rdr)
         return rdr.select(lambda r: r[0] == label)[1]
+
+    def get_secondary_table(self, file, name):
+        """Return the secondary table declared in self.secondary_table_labels under name"""
+        if getattr(self, 'ifile', None) == file and name in getattr(self, 'secondary_tables', {}):
+            return self.secondary_tables[name]
+
+        rdr = self.get_raw_table(file)
+        rdr = self.prepare_raw_file(rdr)
+        return self.extract_table_with_header(rdr, self.secondary_column_labels[name])
@@ -0,0 +1,96 @@
+"""Date parsing for the readers in beancount_reds_importers."""
+
+import calendar
+import datetime
+import functools
+import re
+
+# Statements repeat the same few hundred dates thousands of times, and datetime.strptime() is slow: it takes a
+# lock, looks up the format in a cache of compiled regexes, and then builds the date field by field. Readers
+# instead get a parser for their date format via parser(date_format), which:
+#   - memoizes the dates it parses, in a bounded LRU cache per format
+#   - parses the most common formats with a precompiled regex, instead of via strptime
+#
+# Fast paths only ever accept strings that strptime() would have parsed into the same datetime. Anything else,
+# including valid but unusual forms (eg: '1/5/2023' for '%m/%d/%Y'), falls back to strptime(), which also means
+# invalid dates (eg: '02/30/2023') raise the same ValueError, with the same message, they always did.
+#
+# Importers that set self.date_format get this automatically, via csvreader.convert_columns().
+
+MAX_ENTRIES = 4096  # dates memoized per format
+
+ENGLISH_MONTH_ABBRS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+ENGLISH_MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+                  'november', 'december']
+
+
+def english_locale():
+    """Month name fast paths assume English month names, which is what strptime() uses in the C locale"""
+    return [m.lower() for m in calendar.month_abbr[1:]] == ENGLISH_MONTH_ABBRS
+
+
+def make_datetime(year, month, day):
+    """The datetime, or None for invalid dates (eg: 02/30/2023), so that strptime() raises its own error"""
+    try:
+        return datetime.datetime(year, month, day)
+    except ValueError:
+        return None
+
+
+def numeric_fast_path(pattern, year, month, day):
+    regex = re.compile(pattern, re.ASCII)  # strptime() only takes ASCII digits
+
+    def parse(s):
+        m = regex.fullmatch(s)
+        if not m:
+            return None
+        return make_datetime(int(m.group(year)), int(m.group(month)), int(m.group(day)))
+    return parse
+
+
+def month_name_fast_path(pattern, names, year, month, day):
+    regex = re.compile(pattern, re.ASCII)
+    months = {name: n for n, name in enumerate(names, 1)}
+
+    def parse(s):
+        m = regex.fullmatch(s)
+        if not m or m.group(month).lower() not in months:
+            return None
+        return make_datetime(int(m.group(year)), months[m.group(month).lower()], int(m.group(day)))
+    return parse
+
+
+# Each fast path returns None for strings it doesn't handle
+FAST_PATHS = {
+    '%m/%d/%Y': lambda: numeric_fast_path(r'(\d\d)/(\d\d)/(\d\d\d\d)', 3, 1, 2),
+    '%d/%m/%Y': lambda: numeric_fast_path(r'(\d\d)/(\d\d)/(\d\d\d\d)', 3, 2, 1),
+    '%Y%m%d': lambda: numeric_fast_path(r'(\d\d\d\d)(\d\d)(\d\d)', 1, 2, 3),
+    '%Y-%m-%d': lambda: numeric_fast_path(r'(\d\d\d\d)-(\d\d)-(\d\d)', 1, 2, 3),
+    '%d %b %Y': lambda: month_name_fast_path(r'(\d\d?) ([A-Za-z]{3}) (\d\d\d\d)', ENGLISH_MONTH_ABBRS, 3, 2, 1),
+    '%B %d, %Y': lambda: month_name_fast_path(r'([A-Za-z]+) (\d\d?), (\d\d\d\d)', ENGLISH_MONTHS, 3, 1, 2),
+}
+
+
+def make_parser(date_format):
+    fast_path = None
+    if date_format in FAST_PATHS and english_locale():
+        fast_path = FAST_PATHS[date_format]()
+
+    @functools.lru_cache(maxsize=MAX_ENTRIES)
+    def parse(s):
+        if fast_path is not None and isinstance(s, str):
+            d = fast_path(s)
+            if d is not None:
+                return d
+        return datetime.datetime.strptime(s, date_format)
+    return parse
+
+
+@functools.lru_cache(maxsize=None)
+def parser(date_format):
+    """Return a function that parses strings in date_format into datetimes, like datetime.strptime()"""
+    return make_parser(date_format)
+
+
+def parse(s, date_format):
+    return parser(date_format)(s)
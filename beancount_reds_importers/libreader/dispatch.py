@@ -0,0 +1,207 @@
+"""Importer dispatch index for beancount_reds_importers. Hands each file only to the importers that could
+possibly identify it."""
+
+import sys
+import time
+from os import path
+from beancount_reds_importers.libreader import csvreader
+from beancount_reds_importers.libreader import identify_cache
+from beancount_reds_importers.libreader import row_cache
+
+# bean-identify, bean-extract and bean-file call identify() on every importer in CONFIG, for every file. Each
+# identify() runs custom_init(), an extension check, a filename_pattern match, and finally
+# initialize_reader(), which may parse the entire file. With many importers and many files, this adds up.
+#
+# The dispatch index is built once from CONFIG, and collects the cheap checks for every importer, using the
+# regexes each importer precompiles in compile_importer():
+#   - FILE_EXTS
+#   - filename_pattern (from config, falling back to filename_pattern_def)
+#   - header_identifier, for csv importers that use the default deep_identify()
+#
+# For each file, the cheap checks are evaluated once (each distinct regex is matched only once, no matter how
+# many importers share it), yielding a short list of candidate importers. Only candidates run their full
+# identify(). All other importers return False immediately.
+#
+# Usage, in your import config:
+#
+#   from beancount_reds_importers.libreader import dispatch
+#
+#   CONFIG = dispatch.DispatchIndex([
+#       vanguard.Importer({...}),
+#       ...
+#   ])
+#
+#   # optional: print per-importer identify cost when bean-identify/bean-extract/bean-file exits
+#   import atexit
+#   atexit.register(CONFIG.report)
+#
+# Optionally, identify() verdicts and file_account()/file_name()/file_date() results can be cached on disk
+# across runs by passing cache_dir. See identify_cache.py. Additionally passing cache_rows=True caches what the
+# readers parse out of each file as well. See row_cache.py.
+#
+# Importers that are not built on the reader base class (eg: amazongc) are always treated as candidates.
+
+
+class ImporterSpec():
+    """Precompiled identify() checks for a single importer."""
+
+    def __init__(self, importer):
+        self.importer = importer
+        self.exts = None
+        self.filename_regex = None
+        self.header_regex = None
+        if not hasattr(importer, 'compile_importer'):
+            return
+        importer.compile_importer()
+        self.exts = [ext.lower() for ext in importer.FILE_EXTS]
+        self.filename_regex = importer.filename_regex
+        if isinstance(importer, csvreader.Importer) and \
+                type(importer).initialize_reader is csvreader.Importer.initialize_reader and \
+                type(importer).deep_identify is csvreader.Importer.deep_identify:
+            self.header_regex = importer.header_regex
+
+
+class ImporterStats():
+    def __init__(self):
+        self.calls = 0
+        self.candidates = 0
+        self.cached = 0
+        self.matches = 0
+        self.seconds = 0.0
+
+
+class DispatchIndex(list):
+    """A list of importers (usable directly as CONFIG), that dispatches identify() calls through an index."""
+
+    def __init__(self, importers, cache_dir=None, cache_rows=False):
+        super().__init__(importers)
+        self.cache = identify_cache.IdentifyCache(cache_dir) if cache_dir else None
+        self.row_cache = row_cache.RowCache(cache_dir) if cache_dir and cache_rows else None
+        self.specs = [ImporterSpec(importer) for importer in self]
+        self.stats = {id(importer): ImporterStats() for importer in self}
+        self.by_ext = {}
+        self.passthrough = []
+        for spec in self.specs:
+            spec.importer.dispatch_index = self
+            if spec.exts is None:
+                self.passthrough.append(spec)
+                continue
+            for ext in spec.exts:
+                self.by_ext.setdefault(ext, []).append(spec)
+            if self.cache:
+                self.add_to_cache(spec.importer)
+            if self.row_cache:
+                self.row_cache.add_importer(spec.importer)
+                spec.importer.row_cache = self.row_cache
+        self.current_file = None
+        self.current_candidates = set()
+        self.pending_identify = {}
+
+    def add_to_cache(self, importer):
+        self.cache.add_importer(importer)
+        for name in identify_cache.CACHED_METHODS:
+            # smart_importer_hack makes file_account() depend on who calls it
+            if name == 'file_account' and 'smart_importer_hack' in importer.config:
+                continue
+            setattr(importer, name, self.cached_method(importer, name))
+        setattr(importer, 'extract', self.identified_method(importer, importer.extract))
+
+    def ensure_identified(self, importer, file):
+        """If identify() was answered from the cache, the importer hasn't seen the file yet. Run the full
+        identify() before anything that needs the importer's state for the file."""
+        if self.pending_identify.get(id(importer)) == file.name:
+            del self.pending_identify[id(importer)]
+            importer.identify_file(file)
+
+    def identified_method(self, importer, method):
+        def wrapper(file, *args, **kwargs):
+            self.ensure_identified(importer, file)
+            return method(file, *args, **kwargs)
+        return wrapper
+
+    def cached_method(self, importer, name):
+        method = getattr(importer, name)
+
+        def wrapper(file):
+            entry = self.cache.load(importer, file)
+            if name in entry:
+                return entry[name]
+            self.ensure_identified(importer, file)
+            value = method(file)
+            self.cache.store(importer, file, name, value)
+            return value
+        return wrapper
+
+    def find_candidates(self, file):
+        """Return the ids of the importers that pass the cheap checks for this file."""
+        name = file.name.lower()
+        basename = path.basename(file.name)
+        matched = {}
+
+        def match(regex, target):
+            # the same regex may be a filename_pattern for one importer, and a header_identifier for another
+            if (regex, target) not in matched:
+                s = basename if target == 'filename' else file.head()
+                matched[(regex, target)] = regex.match(s) is not None
+            return matched[(regex, target)]
+
+        candidates = set(id(spec.importer) for spec in self.passthrough)
+        for ext, specs in self.by_ext.items():
+            if not name.endswith(ext):
+                continue
+            for spec in specs:
+                if not match(spec.filename_regex, 'filename'):
+                    continue
+                if spec.header_regex is not None and not match(spec.header_regex, 'header'):
+                    continue
+                candidates.add(id(spec.importer))
+        return candidates
+
+    def candidates(self, file):
+        if self.current_file != file.name:
+            self.current_candidates = self.find_candidates(file)
+            self.current_file = file.name
+        return self.current_candidates
+
+    def identify(self, importer, file, identify_func):
+        """Called by the importer's identify(). identify_func is the importer's full identify."""
+        stats = self.stats.setdefault(id(importer), ImporterStats())
+        stats.calls += 1
+        if id(importer) not in self.candidates(file):
+            return False
+        stats.candidates += 1
+        start = time.perf_counter()
+        try:
+            found = self.cached_identify(importer, file, identify_func, stats)
+        finally:
+            stats.seconds += time.perf_counter() - start
+        if found:
+            stats.matches += 1
+        return found
+
+    def cached_identify(self, importer, file, identify_func, stats):
+        if self.cache is None:
+            return identify_func(file)
+        entry = self.cache.load(importer, file)
+        if 'identify' in entry:
+            stats.cached += 1
+            if entry['identify']:
+                self.pending_identify[id(importer)] = file.name
+            return entry['identify']
+        found = identify_func(file)
+        self.cache.store(importer, file, 'identify', bool(found))
+        return found
+
+    def report(self, file=sys.stderr):
+        """Print the identify cost for each importer, most expensive first."""
+        rows = []
+        for importer in self:
+            s = self.stats[id(importer)]
+            name = getattr(importer, 'IMPORTER_NAME', type(importer).__module__)
+            account = getattr(importer, 'config', {}).get('account_number', '')
+            rows.append((s.seconds, name, account, s))
+        rows.sort(key=lambda r: r[0], reverse=True)
+        print("Identify cost per importer (seconds, calls, candidates, cached, matches):", file=file)
+        for seconds, name, account, s in rows:
+            print(f"{seconds:9.4f} {s.calls:6} {s.candidates:6} {s.cached:6} {s.matches:6}  {name} {account}",
+                  file=file)
@@ -0,0 +1,114 @@
+"""Shared in-memory buffers of input files, for all readers in beancount_reds_importers."""
+
+import hashlib
+import io
+import os
+from collections import OrderedDict
+import petl as etl
+
+# Every importer in CONFIG looks at every file, and each one used to reopen the file by name: petl re-reads it
+# on each pass over a table, ofxparse was handed a file object that was never closed, and helpers like
+# get_row_by_label() went back to the file yet again. This module reads each input file once, and hands out
+# the same immutable bytes to every importer instance and every pass.
+#
+# Readers get at the buffer via one of:
+#   - read_bytes(filename): the raw bytes
+#   - open_binary(filename): a BytesIO over the bytes (eg: for ofxparse, openpyxl)
+#   - open_text(filename): a text stream over the bytes (eg: for the csv module)
+#   - petl_source(filename): a petl source over the bytes (eg: for etl.fromcsv())
+#   - content_hash(filename): a hash of the bytes, for keying on-disk caches
+#
+# Each file is read into memory in full (there is no mmap): readers that need to parse a file in one go (ofx
+# sniffing and parsing, openpyxl) hold the whole of it anyway. Files are opened only to be read, and closed right
+# away, so no file descriptors are held open.
+#
+# Buffers are keyed by file identity (name, size and modification time), so a file that changes on disk is
+# re-read. Only the most recently used files are kept: at most MAX_FILES files, and at most MAX_BYTES bytes in
+# total (the most recently read file is always kept, even if it is larger than that), so batch runs over a large
+# number of files use bounded memory. Content hashes are kept, and evicted, along with their buffers. Change
+# these limits via configure(), eg: in your import config:
+#
+#     from beancount_reds_importers.libreader import filebuffer
+#     filebuffer.configure(max_files=2, max_bytes=64 * 1024 * 1024)
+
+MAX_FILES = 8
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_identity(filename):
+    st = os.stat(filename)
+    return (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+
+
+class FileBuffers():
+    def __init__(self, max_files=MAX_FILES, max_bytes=MAX_BYTES):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.buffers = OrderedDict()
+        self.size = 0
+        self.content_hashes = {}
+
+    def get(self, filename):
+        key = file_identity(filename)
+        if key in self.buffers:
+            self.buffers.move_to_end(key)
+            return self.buffers[key]
+        with open(filename, 'rb') as f:
+            data = f.read()
+        self.buffers[key] = data
+        self.size += len(data)
+        self.evict()
+        return data
+
+    def content_hash(self, filename):
+        key = file_identity(filename)
+        if key not in self.content_hashes:
+            self.content_hashes[key] = hashlib.sha256(self.get(filename)).hexdigest()
+        return self.content_hashes[key]
+
+    def configure(self, max_files=None, max_bytes=None):
+        if max_files is not None:
+            self.max_files = max_files
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self.evict()
+
+    def evict(self):
+        # evict least recently used buffers, but always keep the most recent one
+        while len(self.buffers) > 1 and (len(self.buffers) > self.max_files or self.size > self.max_bytes):
+            key, evicted = self.buffers.popitem(last=False)
+            self.size -= len(evicted)
+            self.content_hashes.pop(key, None)
+
+    def clear(self):
+        self.buffers.clear()
+        self.size = 0
+        self.content_hashes.clear()
+
+
+buffers = FileBuffers()
+
+
+def configure(max_files=None, max_bytes=None):
+    """Change the limits on the files kept in memory (see the top of this file)"""
+    buffers.configure(max_files, max_bytes)
+
+
+def read_bytes(filename):
+    return buffers.get(filename)
+
+
+def open_binary(filename):
+    return io.BytesIO(buffers.get(filename))
+
+
+def open_text(filename, encoding=None, newline=None):
+    return io.TextIOWrapper(open_binary(filename), encoding=encoding, newline=newline)
+
+
+def petl_source(filename):
+    return etl.MemorySource(buffers.get(filename))
+
+
+def content_hash(filename):
+    return buffers.content_hash(filename)
@@ -0,0 +1,100 @@
+"""Persistent cache of identify() and filing results, shared across bean-identify, bean-extract and bean-file
+runs. Used via the dispatch index (see dispatch.py)."""
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+from beancount_reds_importers.libreader import filebuffer
+
+# bean-identify, bean-extract and bean-file are run as separate processes on the same files, and each one
+# repeats identify(), file_account(), file_name() and file_date() for every file from scratch. This cache
+# stores those results on disk, so later runs skip reading and parsing files they have already seen.
+#
+# Entries are keyed by:
+#   - a hash of the file's content
+#   - the file's name (without its directory): file_name() is built from it, so byte-identical files under
+#     different names (eg: two downloads of the same statement) get entries of their own
+#   - a fingerprint of the importer: its class, its config, and the modification times of the modules the
+#     class is built from
+#
+# so changing the file, renaming it, the importer config, or the importer code invalidates the cached results.
+#
+# To enable, pass a cache directory to the dispatch index:
+#
+#   CONFIG = dispatch.DispatchIndex([...], cache_dir='~/.cache/beancount_reds_importers')
+#
+# Each entry is a small file in the cache directory, written atomically, so concurrent runs are safe.
+
+CACHE_VERSION = 2
+CACHED_METHODS = ['file_account', 'file_name', 'file_date']
+
+
+def code_fingerprint(cls):
+    """The modules a class is built from, along with their modification times"""
+    modules = []
+    for c in cls.__mro__:
+        filename = getattr(sys.modules.get(c.__module__), '__file__', None)
+        if filename:
+            modules.append((c.__module__, os.stat(filename).st_mtime_ns))
+    return (cls.__module__, cls.__qualname__, modules)
+
+
+def config_fingerprint(config):
+    try:
+        return json.dumps(config, sort_keys=True, default=repr)
+    except TypeError:
+        return repr(config)
+
+
+def importer_fingerprint(importer):
+    key = repr((CACHE_VERSION, code_fingerprint(type(importer)), config_fingerprint(importer.config)))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def write_atomic(path, obj):
+    """Pickle obj to path, such that concurrent readers see either the old file or the new one in full"""
+    fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, path)
+    except OSError:
+        # eg: the cache directory is full, or read only. Caching is best effort
+        pass
+    finally:
+        # only left behind if something went wrong (including pickling errors, or a KeyboardInterrupt)
+        if os.path.exists(tmpname):
+            os.unlink(tmpname)
+
+
+class IdentifyCache():
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.fingerprints = {}
+
+    def add_importer(self, importer):
+        """Fingerprint the importer. This must happen before the importer is used, since some importers
+        modify their config once initialized."""
+        self.fingerprints[id(importer)] = importer_fingerprint(importer)
+
+    def entry_path(self, importer, file):
+        # the file is read into the shared buffer to hash it, where the readers will find it if they need it
+        content_hash = filebuffer.content_hash(file.name)
+        name_hash = hashlib.sha256(os.path.basename(file.name).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'{content_hash}-{name_hash}-{self.fingerprints[id(importer)]}.pickle')
+
+    def load(self, importer, file):
+        try:
+            with open(self.entry_path(importer, file), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+
+    def store(self, importer, file, name, value):
+        entry = self.load(importer, file)
+        entry[name] = value
+        write_atomic(self.entry_path(importer, file), entry)
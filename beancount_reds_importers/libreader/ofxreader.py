@@ -3,9 +3,53 @@ beancount_reds_importers."""
 
 import datetime
 import ofxparse
+import re
 from collections import namedtuple
 from beancount.ingest import importer
+from beancount_reds_importers.libreader import filebuffer
+from beancount_reds_importers.libreader import ofxstream
 from beancount_reds_importers.libreader import reader
+from beancount_reds_importers.libreader import rowfilter
+from beancount_reds_importers.libreader import statement_cache
+
+
+# Matches the tags needed to identify an ofx file: the account id within an account aggregate (to avoid
+# matching account ids of transfer destinations, eg: <BANKACCTTO>), the currency of the statement, and the end
+# date of the statement's transaction list
+SNIFF_RE = re.compile(rb'<(/?)(BANKACCTFROM|CCACCTFROM|INVACCTFROM|ACCTID|CURDEF|DTEND)>([^<]*)', re.IGNORECASE)
+
+
+def sniff_accounts(filename):
+    """Scan an ofx file for its accounts without parsing it. Returns a list of [account_id, currency, end_date]
+    where end_date is the unparsed <DTEND> of the account's statement, if found."""
+    accounts = []
+    in_account = False
+    currency = None
+    for m in SNIFF_RE.finditer(filebuffer.read_bytes(filename)):
+        closing, tag, value = m.group(1), m.group(2).upper(), m.group(3).strip().decode('ascii', 'ignore')
+        if closing and tag in (b'ACCTID', b'CURDEF', b'DTEND'):
+            continue  # closing tags of elements (in xml, and some sgml files) have no value
+        if tag == b'CURDEF':
+            currency = value
+        elif tag == b'ACCTID':
+            if in_account:
+                accounts.append([value, currency, None])
+        elif tag == b'DTEND':
+            # the statement's transaction list follows its account aggregate
+            if accounts and accounts[-1][2] is None:
+                accounts[-1][2] = value
+        else:
+            in_account = not closing
+    return accounts
+
+
+def parse_ofx(filename, parser='ofxparse'):
+    try:
+        if parser == 'stream':
+            return ofxstream.parse(filebuffer.read_bytes(filename))
+        return ofxparse.OfxParser.parse(filebuffer.open_binary(filename))
+    except ofxparse.OfxParserException:
+        return None
 
 
 class Importer(reader.Reader, importer.ImporterProtocol):
@@ -15,21 +59,79 @@ class Importer(reader.Reader, importer.ImporterProtocol):
         if getattr(self, 'file', None) != file:
             self.file = file
             self.ofx_account = None
+            self.security_list = None
             self.reader_ready = False
-            try:
-                self.ofx = ofxparse.OfxParser.parse(open(file.name))
-            except ofxparse.OfxParserException:
-                return
-            for acc in self.ofx.accounts:
-                # account identifying info fieldname varies across institutions
-                # self.acc_num_field can be overridden in self.custom_init() if needed
-                acc_num_field = getattr(self, 'account_number_field', 'account_id')
-                if self.match_account_number(getattr(acc, acc_num_field),
-                                             self.config['account_number']):
-                    self.ofx_account = acc
-                    self.reader_ready = True
-            if self.reader_ready:
-                self.currency = self.ofx_account.statement.currency.upper()
+            self.file_read_done = False
+            self.sniffed_end_date = None
+            if self.fast_identify():
+                # identify by scanning the account ids in the file. The full parse is deferred to read_file()
+                for acc_id, currency, end_date in sniff_accounts(file.name):
+                    if self.match_account_number(acc_id, self.config['account_number']):
+                        self.reader_ready = True
+                        self.sniffed_end_date = end_date
+                        if currency:
+                            self.currency = currency.upper()
+            else:
+                self.read_file(file)
+
+    def compile_reader(self):
+        self.row_filter = rowfilter.from_importer(self)
+
+    def fast_identify(self):
+        """Identify files by scanning for account ids, instead of parsing them fully. Can be turned off via
+        the 'fast_identify' config option, and isn't possible when an importer matches accounts on a field
+        other than the account id"""
+        return self.config.get('fast_identify', True) and \
+            getattr(self, 'account_number_field', 'account_id') == 'account_id'
+
+    def read_file(self, file):
+        if self.file_read_done:
+            return
+        self.file_read_done = True
+        self.summary = None
+        if getattr(self, 'row_cache', None):
+            # see row_cache.py
+            self.ofx_account, self.security_list = self.row_cache.get(self, file, lambda: self.read_account(file))
+        else:
+            self.ofx_account, self.security_list = self.read_account(file)
+        self.reader_ready = self.ofx_account is not None
+        if self.reader_ready:
+            self.currency = self.ofx_account.statement.currency.upper()
+
+    def read_account(self, file):
+        """Return this importer's account in the file, and the file's security list (None if it has none). This
+        is all the importer holds on to from the parsed file (see get_ofx())"""
+        ofx = self.get_ofx(file)
+        if ofx is None:
+            return None, None
+        return self.find_account(ofx), getattr(ofx, 'security_list', None)
+
+    def find_account(self, ofx):
+        found = None
+        for acc in ofx.accounts:
+            # account identifying info fieldname varies across institutions
+            # self.acc_num_field can be overridden in self.custom_init() if needed
+            acc_num_field = getattr(self, 'account_number_field', 'account_id')
+            if self.match_account_number(getattr(acc, acc_num_field),
+                                         self.config['account_number']):
+                found = acc
+        return found
+
+    @property
+    def ofx(self):
+        """The parsed file. This parses the file again if it isn't in memory (eg: when the importer's account
+        was loaded from the row cache): use self.ofx_account and self.security_list instead"""
+        return self.get_ofx(self.file)
+
+    def get_ofx(self, file):
+        """Return the parsed ofx file. The file is parsed once, and shared by all importer instances (see
+        statement_cache.py). Each importer only holds on to its own account (self.ofx_account).
+
+        The parser is selected via the 'ofx_parser' config: 'ofxparse' (default), or 'stream' (see
+        ofxstream.py), which is much faster on large files, and uses less memory: it doesn't build a tree of the
+        file, though it does read the file in full."""
+        parser = self.config.get('ofx_parser', 'ofxparse')
+        return statement_cache.get(file.name, parser, lambda: parse_ofx(file.name, parser))
 
     def match_account_number(self, file_account, config_account):
         """We many not want to store entire credit card numbers in our config. Or a given ofx may not contain
@@ -38,13 +140,22 @@ class Importer(reader.Reader, importer.ImporterProtocol):
 
     def file_date(self, file):
         "Get the maximum date from the file."
+        if self.sniffed_end_date:
+            # <DTEND> found while identifying: avoid the full parse
+            try:
+                return ofxstream.parse_datetime(self.sniffed_end_date)
+            except (ValueError, TypeError):
+                pass
+        self.read_file(file)
         return self.ofx_account.statement.end_date
 
-    def read_file(self, file):
-        pass
-
     def get_transactions(self):
-        yield from self.ofx_account.statement.transactions
+        # the parsed file is shared by importers (see get_ofx()), so each importer filters its own transactions
+        # (see rowfilter.py) as it reads them
+        if self.row_filter.is_empty():
+            yield from self.ofx_account.statement.transactions
+        else:
+            yield from filter(self.row_filter.accepts, self.ofx_account.statement.transactions)
 
     def get_balance_statement(self, file=None):
         if not hasattr(self.ofx_account.statement, 'balance'):
@@ -69,17 +180,12 @@ class Importer(reader.Reader, importer.ImporterProtocol):
         return None
 
     def get_max_transaction_date(self):
-        try:
-            # date = self.ofx_account.statement.end_date.date() # this is the date of ofx download
-            # we find the last transaction's date. If we use the ofx download date (if our source is ofx), we
-            # could end up with a gap in time between the last transaction's date and balance assertion.
-            # Pending (but not yet downloaded) transactions in this gap will get downloaded the next time we
-            # do a download in the future, and cause the balance assertions to be invalid.
-
-            date = max(ot.tradeDate if hasattr(ot, 'tradeDate') else ot.date
-                       for ot in self.get_transactions()).date()
-        except TypeError:
-            return False
-        except ValueError:
+        # date = self.ofx_account.statement.end_date.date() # this is the date of ofx download
+        # we find the last transaction's date. If we use the ofx download date (if our source is ofx), we
+        # could end up with a gap in time between the last transaction's date and balance assertion.
+        # Pending (but not yet downloaded) transactions in this gap will get downloaded the next time we
+        # do a download in the future, and cause the balance assertions to be invalid.
+        summary = self.get_summary()
+        if summary.date_error is not None or summary.max_trade_date is None:
             return False
-        return date
+        return summary.max_trade_date.date()
@@ -0,0 +1,414 @@
+"""Streaming ofx parser for ofxreader. An alternative to ofxparse, selected via the 'ofx_parser' config."""
+
+import datetime
+import decimal
+import html
+import re
+from ofxparse import mcc
+from ofxparse import ofxparse as ofx_types
+
+# ofxparse builds a BeautifulSoup tree of the entire document before returning anything, after first copying
+# the document into a string with closing tags inserted. For multi-year brokerage files, that takes seconds and
+# hundreds of MB. This parser instead makes a single pass over the file's tags (via a regex scanning the raw
+# bytes), and never builds a tree: only the aggregates that end up in the result (statements, transactions,
+# positions, balances, securities) are collected, each into a small dict of its fields, which is turned into
+# an object as soon as the aggregate closes.
+#
+# It handles both OFX 1.x SGML (where elements are not closed) and OFX 2.x XML. The result uses ofxparse's own
+# classes, with the same attributes ofxparse sets, so readers and builders work with either:
+#   - ofx.accounts, ofx.account, ofx.security_list
+#   - account: account_id, statement, etc.
+#   - statement: transactions, positions, currency, start_date, end_date, balance, available_cash, etc.
+#   - transactions: type, date, amount, payee, memo, id (banking), or type, tradeDate, settleDate, security,
+#     units, unit_price, total, fees, commission, memo (investments)
+#
+# Like ofxparse, investment transactions are ordered by type, followed by banking transactions, and positions
+# are ordered by type. Accounts from account info responses (<ACCTINFORS>) follow those from statements.
+#
+# It rejects the same malformed files ofxparse does (with its default fail_fast), raising OfxParserException.
+# Notably, elements that are read must not be empty (eg: <BALAMT></BALAMT>), except for memos. As with ofxparse,
+# an empty element that isn't closed (in OFX 1.x) has the value '', which is fine for text, but not for numbers
+# or dates. Statuses are checked, but not kept (ofx.signon and ofx.status aren't set).
+#
+# The file itself is read into memory in full (via filebuffer, which shares it with identify()), so this only
+# saves the memory and time of ofxparse's string copies and tree, which are many times the size of the file.
+#
+# Select it per importer via the config:
+#   'ofx_parser': 'stream',
+
+# a tag, followed by its value, if any. Values may be wrapped in CDATA sections
+TAG_RE = re.compile(rb'<(/?)([A-Za-z0-9_.]+)>((?:[^<]+|<!\[CDATA\[.*?\]\]>)*)', re.DOTALL)
+CDATA_RE = re.compile(rb'<!\[CDATA\[(.*?)\]\]>', re.DOTALL)
+HEADER_RE = re.compile(rb'^\s*([A-Za-z]+)\s*:\s*(\S*)\s*$', re.MULTILINE)
+XML_ENCODING_RE = re.compile(rb'<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9_.-]+)["\']')
+TZ_RE = re.compile(r"\[(?P<tz>[-+]?\d+\.?\d*)\:\w*\]$")
+FRACTION_RE = re.compile(r"^[0-9]*\.([0-9]{0,5})")
+
+STATEMENT_TYPES = {'STMTRS': ofx_types.AccountType.Bank,
+                   'CCSTMTRS': ofx_types.AccountType.CreditCard,
+                   'INVSTMTRS': ofx_types.AccountType.Investment}
+INVESTMENT_TYPES = [t.upper() for t in ofx_types.InvestmentTransaction.AGGREGATE_TYPES]
+POSITION_TYPES = ['POSMF', 'POSSTOCK', 'POSOPT', 'POSOTHER', 'POSDEBT']
+
+ACCOUNT_INFO_TYPES = {'BANKACCTINFO': ofx_types.AccountType.Bank,
+                      'CCACCTINFO': ofx_types.AccountType.CreditCard,
+                      'INVACCTINFO': ofx_types.AccountType.Investment}
+
+# aggregates that are collected. Fields of all other aggregates are collected into the enclosing one
+RECORD_TAGS = set(STATEMENT_TYPES) | set(INVESTMENT_TYPES) | set(POSITION_TYPES) | set(ACCOUNT_INFO_TYPES) | \
+    {'STMTTRN', 'LEDGERBAL', 'AVAILBAL', 'INVBAL', 'BAL', 'SECINFO', 'FI', 'ACCTINFO', 'STATUS'}
+
+# elements whose values are read (by this parser, or by ofxparse). Like ofxparse, these can't be empty (eg:
+# <BALAMT></BALAMT>), except for those in EMPTY_OK for the enclosing record (or aggregate, outside of records),
+# which are then ignored. Elements with
+# only whitespace have the value '' (which is then rejected for numbers and dates)
+VALUE_FIELDS = {'TRNTYPE', 'NAME', 'MEMO', 'TRNAMT', 'DTPOSTED', 'DTUSER', 'FITID', 'SIC', 'CHECKNUM', 'UNIQUEID',
+                'INCOMETYPE', 'INV401KSOURCE', 'TFERACTION', 'DTTRADE', 'DTSETTLE', 'UNITS', 'UNITPRICE',
+                'COMMISSION', 'FEES', 'TOTAL', 'MKTVAL', 'DTPRICEASOF', 'SECNAME', 'TICKER', 'DESC', 'VALUE', 'ORG',
+                'FID', 'BALAMT', 'DTASOF', 'CURDEF', 'ACCTID', 'BANKID', 'BRANCHID', 'ACCTTYPE', 'BROKERID',
+                'DTSTART', 'DTEND', 'AVAILCASH', 'MARGINBALANCE', 'SHORTBALANCE', 'BUYPOWER', 'CODE', 'SEVERITY',
+                'MESSAGE', 'TRNUID'}
+BANK_ACCOUNT_EMPTY_OK = {'BANKID', 'BRANCHID', 'ACCTID', 'ACCTTYPE'}
+EMPTY_OK = {'STATUS': {'SEVERITY', 'MESSAGE'},
+            'STMTRS': BANK_ACCOUNT_EMPTY_OK,
+            'CCSTMTRS': BANK_ACCOUNT_EMPTY_OK,
+            'BANKACCTINFO': BANK_ACCOUNT_EMPTY_OK,
+            'CCACCTINFO': BANK_ACCOUNT_EMPTY_OK,
+            'INVSTMTRS': {'DTASOF', 'DTEND'},
+            'INVACCTINFO': {'DTASOF', 'DTEND'},
+            'STMTTRN': {'MEMO'},
+            'STMTTRNRS': set(),
+            'CCSTMTTRNRS': set()}
+# fields outside of records are only read by ofxparse for bank and credit card statements
+OTHER_EMPTY_OK = {'TRNUID'}
+
+
+def parse_datetime(s):
+    """Same as ofxparse.OfxParser.parseOfxDateTime(). Eg: 20101106160000.00[-5:EST]"""
+    res = TZ_RE.search(s)
+    tz_offset = datetime.timedelta(hours=float(res.group('tz')) if res else 0)
+    res = FRACTION_RE.search(s)
+    fraction = datetime.timedelta(seconds=float("0." + res.group(1)) if res else 0)
+    try:
+        local_date = datetime.datetime.strptime(s[:14], '%Y%m%d%H%M%S')
+    except ValueError:
+        if s[:8] == "00000000":
+            return None
+        local_date = datetime.datetime.strptime(s[:8], '%Y%m%d')
+    return local_date - tz_offset + fraction
+
+
+def to_decimal(d):
+    """Same as ofxparse.OfxParser.toDecimal()"""
+    if re.search(r'.*\..*,', d):    # 10,000.50
+        d = d.replace('.', '')
+    if re.search(r'.*,.*\.', d):    # 10.000,50
+        d = d.replace(',', '')
+    if '.' not in d and ',' in d:   # 10000,50
+        d = d.replace(',', '.')
+    return decimal.Decimal(d.replace(' ', '').replace('+', ''))
+
+
+def read_headers(data):
+    """Return the OFX 1.x headers (before the first tag), and the encoding of the document"""
+    start = data.find(b'<')
+    headers = {k.decode('ascii').upper(): v.decode('ascii', 'replace')
+               for k, v in HEADER_RE.findall(data[:start if start >= 0 else len(data)])}
+    encoding = 'utf-8'
+    if headers.get('ENCODING') == 'USASCII':
+        charset = headers.get('CHARSET', '1252')
+        encoding = 'iso-8859-1' if charset == '8859-1' else f'cp{charset}'
+    else:
+        m = XML_ENCODING_RE.search(data, 0, 1024)
+        if m:
+            encoding = m.group(1).decode('ascii')
+    for k, v in headers.items():
+        if v.upper() == 'NONE':
+            headers[k] = None
+    return headers, encoding
+
+
+class Record():
+    def __init__(self, tag):
+        self.tag = tag
+        self.fields = {}
+        self.empty = set()  # fields that were empty, and ignored
+        self.children = {}
+
+    def get(self, field, default=None):
+        return self.fields.get(field, default)
+
+    def add_child(self, tag, obj):
+        self.children.setdefault(tag, []).append(obj)
+
+    def children_of(self, tags):
+        return [c for tag in tags for c in self.children.get(tag, [])]
+
+
+def build_transaction(r):
+    t = ofx_types.Transaction()
+    if 'TRNTYPE' in r.fields:
+        t.type = r.get('TRNTYPE').lower()
+    t.payee = r.get('NAME', t.payee)
+    t.memo = r.get('MEMO', t.memo)
+    if 'TRNAMT' not in r.fields:
+        raise ofx_types.OfxParserException("Missing Transaction Amount (a required field)")
+    try:
+        t.amount = to_decimal(r.get('TRNAMT'))
+    except decimal.InvalidOperation:
+        # Some banks use a null transaction for including interest rate changes on your statement
+        if r.get('TRNAMT') not in ('null', '-null'):
+            raise ofx_types.OfxParserException(f"Invalid Transaction Amount: '{r.get('TRNAMT')}'")
+        t.amount = 0
+    if 'DTPOSTED' not in r.fields:
+        raise ofx_types.OfxParserException("Missing Transaction Date (a required field)")
+    try:
+        t.date = parse_datetime(r.get('DTPOSTED'))
+        if 'DTUSER' in r.fields:
+            t.user_date = parse_datetime(r.get('DTUSER'))
+    except ValueError as err:
+        raise ofx_types.OfxParserException(str(err))
+    if 'FITID' not in r.fields:
+        raise ofx_types.OfxParserException("Missing FIT id (a required field)")
+    t.id = r.get('FITID')
+    t.sic = r.get('SIC')
+    if t.sic is not None and t.sic in mcc.codes:
+        t.mcc = mcc.codes.get(t.sic, {}).get('combined description')
+    t.checknum = r.get('CHECKNUM', t.checknum)
+    return t
+
+
+def build_investment_transaction(r):
+    t = ofx_types.InvestmentTransaction(r.tag)
+    for field, attr in [('FITID', 'id'), ('MEMO', 'memo'), ('UNIQUEID', 'security'), ('INCOMETYPE', 'income_type'),
+                        ('INV401KSOURCE', 'inv401ksource'), ('TFERACTION', 'tferaction')]:
+        if field in r.fields:
+            setattr(t, attr, r.get(field))
+    for field, attr in [('DTTRADE', 'tradeDate'), ('DTSETTLE', 'settleDate')]:
+        if field in r.fields:
+            setattr(t, attr, parse_datetime(r.get(field)))
+    for field, attr in [('UNITS', 'units'), ('UNITPRICE', 'unit_price'), ('COMMISSION', 'commission'),
+                        ('FEES', 'fees'), ('TOTAL', 'total')]:
+        if field in r.fields:
+            setattr(t, attr, to_decimal(r.get(field)))
+    return t
+
+
+def build_position(r):
+    p = ofx_types.Position()
+    p.security = r.get('UNIQUEID', p.security)
+    for field, attr in [('UNITS', 'units'), ('UNITPRICE', 'unit_price'), ('MKTVAL', 'market_value')]:
+        if field in r.fields:
+            setattr(p, attr, to_decimal(r.get(field)))
+    if 'DTPRICEASOF' in r.fields:
+        p.date = parse_datetime(r.get('DTPRICEASOF'))
+    return p
+
+
+def build_security(r):
+    if 'UNIQUEID' in r.fields and 'SECNAME' in r.fields:
+        return ofx_types.Security(r.get('UNIQUEID'), r.get('SECNAME'), r.get('TICKER'), r.get('MEMO'))
+    return None
+
+
+def build_brokerage_balance(r):
+    b = ofx_types.BrokerageBalance()
+    b.name = r.get('NAME')
+    b.description = r.get('DESC')
+    if 'VALUE' in r.fields:
+        b.value = to_decimal(r.get('VALUE'))
+    return b
+
+
+def build_institution(r):
+    i = ofx_types.Institution()
+    i.organization = r.get('ORG', i.organization)
+    i.fid = r.get('FID', i.fid)
+    return i
+
+
+def build_balance(statement, r, attr, date_attr):
+    if 'BALAMT' in r.fields:
+        setattr(statement, attr, to_decimal(r.get('BALAMT')))
+    if 'DTASOF' in r.fields:
+        setattr(statement, date_attr, parse_datetime(r.get('DTASOF')))
+
+
+def build_bank_account(r):
+    account = ofx_types.Account()
+    account.curdef = r.get('CURDEF')
+    account.account_id = r.get('ACCTID', account.account_id)
+    account.routing_number = r.get('BANKID', account.routing_number)
+    account.branch_id = r.get('BRANCHID', account.branch_id)
+    account.account_type = r.get('ACCTTYPE', account.account_type)
+    account.type = STATEMENT_TYPES.get(r.tag) or ACCOUNT_INFO_TYPES[r.tag]
+
+    statement = account.statement = ofx_types.Statement()
+    if 'DTSTART' in r.fields:
+        statement.start_date = parse_datetime(r.get('DTSTART'))
+    if 'DTEND' in r.fields:
+        statement.end_date = parse_datetime(r.get('DTEND'))
+    if 'CURDEF' in r.fields:
+        statement.currency = r.get('CURDEF').lower()
+    for bal in r.children_of(['LEDGERBAL']):
+        build_balance(statement, bal, 'balance', 'balance_date')
+    for bal in r.children_of(['AVAILBAL']):
+        build_balance(statement, bal, 'available_balance', 'available_balance_date')
+    statement.transactions = r.children_of(['STMTTRN'])
+    return account
+
+
+def build_investment_account(r):
+    account = ofx_types.InvestmentAccount()
+    account.account_id = r.get('ACCTID', account.account_id)
+    account.brokerid = r.get('BROKERID', account.brokerid)
+    account.type = ofx_types.AccountType.Investment
+
+    statement = account.statement = ofx_types.InvestmentStatement()
+    if 'CURDEF' in r.fields:
+        statement.currency = r.get('CURDEF').lower()
+    if 'DTSTART' in r.fields:
+        statement.start_date = parse_datetime(r.get('DTSTART'))
+    if 'DTEND' in r.fields:
+        statement.end_date = parse_datetime(r.get('DTEND'))
+    elif 'DTEND' in r.empty:
+        statement.warnings.append('Empty end date.')
+    statement.positions = r.children_of(POSITION_TYPES)
+    statement.transactions = r.children_of(INVESTMENT_TYPES) + r.children_of(['STMTTRN'])
+    for invbal in r.children_of(['INVBAL']):
+        for field, attr in [('AVAILCASH', 'available_cash'), ('MARGINBALANCE', 'margin_balance'),
+                            ('SHORTBALANCE', 'short_balance'), ('BUYPOWER', 'buy_power')]:
+            if field in invbal.fields:
+                setattr(statement, attr, to_decimal(invbal.get(field)))
+        if 'BAL' in invbal.children:
+            statement.balance_list = invbal.children['BAL']
+    return account
+
+
+def build_account_info(r):
+    """An account from an account info response, with an empty statement"""
+    accounts = r.children_of(list(ACCOUNT_INFO_TYPES))
+    if not accounts:
+        return None
+    account = accounts[0]
+    if 'DESC' in r.fields:
+        account.desc = r.get('DESC')
+    return account
+
+
+def check_status(r):
+    """Statuses are not kept, but like ofxparse, reject those with a non-numeric code"""
+    int(r.get('CODE', ''))
+    return None
+
+
+def build_record(r):
+    """Turn a closed record into the object its parent collects"""
+    if r.tag == 'STMTTRN':
+        return build_transaction(r)
+    if r.tag in POSITION_TYPES:
+        return build_position(r)
+    if r.tag in INVESTMENT_TYPES:
+        return build_investment_transaction(r)
+    if r.tag in ('INVSTMTRS', 'INVACCTINFO'):
+        return build_investment_account(r)
+    if r.tag in STATEMENT_TYPES or r.tag in ACCOUNT_INFO_TYPES:
+        return build_bank_account(r)
+    if r.tag == 'ACCTINFO':
+        return build_account_info(r)
+    if r.tag == 'STATUS':
+        return check_status(r)
+    if r.tag == 'SECINFO':
+        return build_security(r)
+    if r.tag == 'BAL':
+        return build_brokerage_balance(r)
+    if r.tag == 'FI':
+        return build_institution(r)
+    return r  # balances: read by the statement
+
+
+def decode_value(value, encoding):
+    if b'<![CDATA[' in value:
+        return CDATA_RE.sub(lambda cdata: cdata.group(1), value).strip().decode(encoding, 'replace')
+    value = value.decode(encoding, 'replace')
+    return html.unescape(value) if '&' in value else value
+
+
+class StreamParser():
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.root = Record(None)
+        self.stack = []             # open aggregates: (tag, record or None)
+        self.records = [self.root]  # the open aggregates that are collected. Innermost last
+        self.last_leaf = None
+        self.found_ofx = False
+
+    def feed(self, closing, tag, raw_value):
+        value = raw_value.strip()
+        if closing:
+            # in OFX 2.x, elements with values are closed too. Nothing to do for those
+            if tag != self.last_leaf and any(open_tag == tag for open_tag, _ in self.stack):
+                self.close(tag)
+            self.last_leaf = None
+        elif value or tag in VALUE_FIELDS:
+            # fields belong to the innermost collected aggregate. The first occurrence of a field wins
+            record = self.records[-1]
+            context = record.tag or (self.stack[-1][0] if self.stack else 'OFX')
+            if raw_value:
+                record.fields.setdefault(tag, decode_value(value, self.encoding))
+            elif tag in EMPTY_OK.get(context, OTHER_EMPTY_OK):
+                record.empty.add(tag)
+            else:
+                raise ofx_types.OfxParserException(f'Empty <{tag}> in <{context}>')
+            self.last_leaf = tag
+        else:
+            self.found_ofx = self.found_ofx or tag == 'OFX'
+            record = Record(tag) if tag in RECORD_TAGS else None
+            self.stack.append((tag, record))
+            if record is not None:
+                self.records.append(record)
+            self.last_leaf = None
+
+    def close(self, tag):
+        """Close tag, along with any aggregates opened within it and not explicitly closed (all aggregates, if
+        tag is None)"""
+        while self.stack:
+            open_tag, record = self.stack.pop()
+            if record is not None:
+                self.records.pop()
+                obj = build_record(record)
+                if obj is not None:
+                    self.records[-1].add_child(record.tag, obj)
+            if open_tag == tag:
+                return
+
+    def result(self, headers):
+        self.close(None)
+        if not self.found_ofx:
+            raise ofx_types.OfxParserException('The ofx file is empty!')
+        root = self.root
+        ofx = ofx_types.Ofx()
+        ofx.headers = headers
+        ofx.signon = None
+        ofx.accounts = root.children_of(['STMTRS', 'CCSTMTRS', 'INVSTMTRS', 'ACCTINFO'])
+        if 'INVSTMTRS' in root.children:
+            ofx.security_list = root.children.get('SECINFO', None)
+        if 'FI' in root.children:
+            for account in ofx.accounts:
+                account.institution = root.children['FI'][0]
+        if ofx.accounts:
+            ofx.account = ofx.accounts[0]
+        return ofx
+
+
+def parse(data):
+    """Parse ofx bytes (the whole file) into an ofxparse.Ofx object. Raises ofxparse.OfxParserException if data
+    isn't ofx, or is malformed."""
+    headers, encoding = read_headers(data)
+    parser = StreamParser(encoding)
+    try:
+        for m in TAG_RE.finditer(data):
+            parser.feed(m.group(1), m.group(2).decode('ascii').upper(), m.group(3))
+        return parser.result(headers)
+    except (ValueError, decimal.InvalidOperation) as err:
+        raise ofx_types.OfxParserException(str(err)) from err
@@ -1,15 +1,99 @@
 """Reader module base class for beancount_reds_importers. ofx, csv, etc. readers inherit this."""
 
+import contextvars
+from collections import Counter
 import ntpath
+import sys
 from os import path
 import re
 
+# Set while smart_importer hooks run on an importer's entries (see apply_hooks() below), so that
+# file_account() can tell smart_importer calls apart from bean-file calls
+in_smart_importer_hook = contextvars.ContextVar('in_smart_importer_hook', default=False)
+
+
+def apply_hooks(importer, hooks):
+    """Drop-in replacement for smart_importer.apply_hooks(), that lets file_account() know when it is being
+    called by a smart_importer hook. Use this when your config sets 'smart_importer_hack'."""
+    from smart_importer import apply_hooks as smart_importer_apply_hooks
+
+    def wrap(hook):
+        def wrapped_hook(*args, **kwargs):
+            token = in_smart_importer_hook.set(True)
+            try:
+                return hook(*args, **kwargs)
+            finally:
+                in_smart_importer_hook.reset(token)
+        return wrapped_hook
+
+    return smart_importer_apply_hooks(importer, [wrap(hook) for hook in hooks])
+
+
+def called_from_smart_importer():
+    if in_smart_importer_hook.get():
+        return True
+    # Fallback for hooks applied via smart_importer.apply_hooks() directly: look for smart_importer's
+    # predictor up the call stack
+    frame = sys._getframe(1)
+    while frame is not None:
+        if 'predictor' in frame.f_code.co_filename:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class StatementSummary():
+    """Facts about a statement's transactions, gathered in a single pass over them:
+    - row_count
+    - type_counts: number of transactions of each type
+    - securities: the distinct securities transacted
+    - min_date, max_date: bounds of ot.date
+    - min_trade_date, max_trade_date: bounds of ot.tradeDate, or ot.date for transactions without one
+    Date bounds are None if there are no transactions. If dates fail to compare (eg: a date failed to parse,
+    and is None), the exception is kept in date_error."""
+
+    def __init__(self, transactions):
+        self.row_count = 0
+        self.type_counts = Counter()
+        self.securities = set()
+        self.min_date = self.max_date = None
+        self.min_trade_date = self.max_trade_date = None
+        self.date_error = None
+        for ot in transactions:
+            self.add(ot)
+
+    def add(self, ot):
+        self.row_count += 1
+        self.type_counts[getattr(ot, 'type', None)] += 1
+        if hasattr(ot, 'security'):
+            self.securities.add(ot.security)
+        if self.date_error is not None:
+            return
+        try:
+            if hasattr(ot, 'date'):
+                self.min_date = ot.date if self.min_date is None else min(self.min_date, ot.date)
+                self.max_date = ot.date if self.max_date is None else max(self.max_date, ot.date)
+            trade_date = ot.tradeDate if hasattr(ot, 'tradeDate') else ot.date
+            self.min_trade_date = trade_date if self.min_trade_date is None else min(self.min_trade_date, trade_date)
+            self.max_trade_date = trade_date if self.max_trade_date is None else max(self.max_trade_date, trade_date)
+        except (AttributeError, TypeError) as err:
+            self.date_error = err
+
 
 class Reader():
     FILE_EXTS = ['']
     IMPORTER_NAME = 'NOT SET'
+    SUMMARY_FIELDS = ['date', 'tradeDate', 'type', 'security']  # transaction fields used by StatementSummary
 
     def identify(self, file):
+        # If this importer is part of a dispatch index (see dispatch.py), let the index decide if this file
+        # is worth looking at. Else run the full identify
+        dispatch_index = getattr(self, 'dispatch_index', None)
+        if dispatch_index is not None:
+            return dispatch_index.identify(self, file, self.identify_file)
+        return self.identify_file(file)
+
+    def identify_file(self, file):
         # quick check to filter out files that are not the right format
         # print()
         # print('------------------', self.IMPORTER_NAME, '(' + self.FILE_EXT + ')')
@@ -17,9 +101,8 @@ class Reader():
         if not any(file.name.lower().endswith(ext) for ext in self.FILE_EXTS):
             # print("No match on extension")
             return False
-        self.custom_init()
-        self.filename_pattern = self.config.get('filename_pattern', self.filename_pattern_def)
-        if not re.match(self.filename_pattern, path.basename(file.name)):
+        self.compile_importer()
+        if not self.filename_regex.match(path.basename(file.name)):
             # print("No match on filename_pattern", self.filename_pattern, path.basename(file.name))
             return False
         self.currency = self.config.get('currency', 'CURRENCY_NOT_CONFIGURED')
@@ -27,6 +110,31 @@ class Reader():
         # print("reader_ready:", self.reader_ready)
         return self.reader_ready
 
+    def compile_importer(self):
+        """Run custom_init() and precompile everything derived from it (regexes, maps, etc.). This is done
+        once per importer instance, and reused for every file identified or extracted."""
+        if getattr(self, 'importer_compiled', False):
+            return
+        self.custom_init()
+        self.filename_pattern = self.config.get('filename_pattern', self.filename_pattern_def)
+        self.filename_regex = re.compile(self.filename_pattern)
+        self.compile_reader()
+        self.importer_compiled = True
+
+    def compile_reader(self):
+        """For readers to override, to precompile reader specific declarations set in custom_init()"""
+        pass
+
+    def used_fields(self, builder_fields):
+        """The set of fields that are used, out of those a reader produces: builder_fields (declared by the
+        transaction builder), plus the ones the reader uses, plus any the importer declares in self.extra_fields
+        (eg: for its own hooks). With 'project_columns': True in the config, readers skip parsing and converting
+        all other fields (see csvreader.py). Returns None, meaning all fields are used, if that is off, or if the
+        builder doesn't declare its fields."""
+        if builder_fields is None or not self.config.get('project_columns', False):
+            return None
+        return set(builder_fields) | set(self.SUMMARY_FIELDS) | set(getattr(self, 'extra_fields', []))
+
     def file_name(self, file):
         return '{}'.format(ntpath.basename(file.name))
 
@@ -35,20 +143,23 @@ class Reader():
         # https://github.com/redstreet/beancount_reds_importers/issues/41
         # https://github.com/beancount/smart_importer/issues/122
         # https://github.com/beancount/smart_importer/issues/30
-        import inspect
-        curframe = inspect.currentframe()
-        calframe = inspect.getouterframes(curframe, 2)
 
         # smart_importer call
-        if any('predictor' in i.filename for i in calframe):
-            if 'smart_importer_hack' in self.config:
-                return self.config['smart_importer_hack']
+        if 'smart_importer_hack' in self.config and called_from_smart_importer():
+            return self.config['smart_importer_hack']
 
         # bean-file call
         if 'filing_account' in self.config:
             return self.config['filing_account']
         return self.config['main_account'].replace(':{ticker}', '').replace(':{currency}', '')
 
+    def get_summary(self):
+        """Return the StatementSummary of the transactions in the file that was read. Readers reset
+        self.summary when they read a new file."""
+        if getattr(self, 'summary', None) is None:
+            self.summary = StatementSummary(self.get_transactions())
+        return self.summary
+
     def get_balance_statement(self, file=None):
         return []
 
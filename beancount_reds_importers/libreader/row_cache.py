@@ -0,0 +1,84 @@
+"""Persistent cache of the rows readers produce from input files. Opt-in, via the dispatch index (see
+dispatch.py)."""
+
+import hashlib
+import os
+import pickle
+from importlib import metadata
+from beancount_reds_importers.libreader import filebuffer
+from beancount_reds_importers.libreader import identify_cache
+
+# Parsing dominates import time: ofxparse for ofx files, petl and convert_columns() for csv files, and openpyxl
+# for xlsx files. Yet most downloaded files never change. This cache stores what each reader produces from a
+# file on disk:
+#   - ofxreader: the importer's account (transactions, positions, balances), and the file's security list
+#   - csvreader (and tsv/xls/xlsx readers): the normalized table, after convert_columns() and the importer's
+#     prepare_*() hooks, and the labelled rows and secondary tables found along with it
+#   - csv/xlsx multitable readers: the split up section tables, before the importer's prepare_tables()
+# and loads it back instead of parsing the file on the next run.
+#
+# Entries are keyed by:
+#   - a hash of the file's content
+#   - the reader's version: ROW_CACHE_VERSION, the modification times of the modules the importer class is
+#     built from, and the versions of the parsing libraries
+#   - the importer's config, minus the keys that only the transaction builders use (BUILDER_CONFIG_KEYS), so
+#     that eg: renaming an account doesn't throw away the cache
+#
+# Entries are pickled, and written atomically, so concurrent runs are safe. To enable:
+#
+#   CONFIG = dispatch.DispatchIndex([...], cache_dir='~/.cache/beancount_reds_importers', cache_rows=True)
+
+ROW_CACHE_VERSION = 3
+
+# config keys that don't affect what readers produce
+BUILDER_CONFIG_KEYS = ['main_account', 'filing_account', 'smart_importer_hack', 'cash_account', 'target_account',
+                       'transfer', 'dividends', 'interest', 'cg', 'capgainsd_lt', 'capgainsd_st', 'fees',
+                       'rounding_error', 'fund_info', 'desc', 'paycheck_template', 'sort_postings',
+                       'csv_processes', 'csv_parallel_min_rows']
+
+PARSER_PACKAGES = ['ofxparse', 'petl', 'openpyxl', 'xlrd']
+
+
+def package_versions():
+    versions = []
+    for package in PARSER_PACKAGES:
+        try:
+            versions.append((package, metadata.version(package)))
+        except metadata.PackageNotFoundError:
+            pass
+    return versions
+
+
+def reader_fingerprint(importer):
+    config = {k: v for k, v in importer.config.items() if k not in BUILDER_CONFIG_KEYS}
+    key = repr((ROW_CACHE_VERSION, identify_cache.code_fingerprint(type(importer)), package_versions(),
+                identify_cache.config_fingerprint(config)))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class RowCache():
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.join(os.path.expanduser(cache_dir), 'rows')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.fingerprints = {}
+
+    def add_importer(self, importer):
+        """Fingerprint the importer, before it is used (see IdentifyCache.add_importer())."""
+        self.fingerprints[id(importer)] = reader_fingerprint(importer)
+
+    def entry_path(self, importer, file):
+        content_hash = filebuffer.content_hash(file.name)
+        return os.path.join(self.cache_dir, f'{content_hash}-{self.fingerprints[id(importer)]}.pickle')
+
+    def get(self, importer, file, read):
+        """Return the cached rows for importer and file. If not found, call read() to read the file, and
+        cache what it returns."""
+        path = self.entry_path(importer, file)
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+        rows = read()
+        identify_cache.write_atomic(path, rows)
+        return rows
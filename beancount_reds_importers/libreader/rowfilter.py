@@ -0,0 +1,114 @@
+"""Filtering of transactions by date, type and security, for the readers in beancount_reds_importers."""
+
+import datetime
+
+# Importers often only need some of the transactions in a file, eg: the last month out of a multi-year history
+# file. Rather than convert every row and then drop most of them, readers drop rows as early as they can:
+#   - csvreader: right after columns are renamed via header_map, on the raw (unconverted) values, before
+#     anything else is converted
+#   - ofxreader: before transactions are handed to the summary and the transaction builder
+#   - multitable readers: on the sections that have the filtered fields, after prepare_tables()
+#
+# The filter is set in the importer's config, or by the importer itself (eg: from other config) in
+# custom_init(), as attributes of the same names:
+#   'filter_start_date': first date to import (a date, or a string like '2023-01-31')
+#   'filter_end_date':   date to import up to, but not including
+#   'filter_types':      transaction types to import (after transaction_type_map), eg: ['buystock', 'sellstock']
+#   'filter_skip_types': transaction types not to import
+#   'filter_securities': securities to import, eg: ['VTI', 'VXUS']
+#
+# Dates are the trade date, or the date for transactions without one (same as StatementSummary). When filtering
+# by date, rows whose date fails to parse are dropped.
+
+
+def to_date(d):
+    if isinstance(d, datetime.datetime):
+        return d.date()
+    if isinstance(d, datetime.date):
+        return d
+    return datetime.date.fromisoformat(d)
+
+
+class RowFilter():
+    def __init__(self, start_date=None, end_date=None, types=None, skip_types=None, securities=None):
+        self.start_date = None if start_date is None else to_date(start_date)
+        self.end_date = None if end_date is None else to_date(end_date)
+        self.types = None if types is None else set(types)
+        self.skip_types = set(skip_types or [])
+        self.securities = None if securities is None else set(securities)
+
+    def is_empty(self):
+        return self.start_date is None and self.end_date is None and self.types is None and \
+            not self.skip_types and self.securities is None
+
+    def date_ok(self, d):
+        if self.start_date is None and self.end_date is None:
+            return True
+        try:
+            d = to_date(d)
+        except (TypeError, ValueError):
+            return False
+        return (self.start_date is None or d >= self.start_date) and (self.end_date is None or d < self.end_date)
+
+    def type_ok(self, t):
+        return (self.types is None or t in self.types) and t not in self.skip_types
+
+    def security_ok(self, s):
+        return self.securities is None or s in self.securities
+
+    def accepts(self, ot):
+        """Whether to import a transaction (a namedtuple, or an ofx transaction)"""
+        d = getattr(ot, 'tradeDate', None) or getattr(ot, 'date', None)
+        return self.date_ok(d) and self.type_ok(getattr(ot, 'type', None)) and \
+            self.security_ok(getattr(ot, 'security', None))
+
+    def row_predicate(self, fields, parse_date=None, type_map=None):
+        """Return a function that tells whether to import a row of a table with the given fields (header), from
+        the cells as they are: dates can be strings, parsed via parse_date, and types can be raw types, mapped via
+        type_map. Returns None if there is nothing to check, eg: if the table has none of the filtered fields."""
+        if self.is_empty():
+            return None
+        fields = list(fields)
+        checks = []
+
+        def cell(row, i):
+            return row[i] if i < len(row) else None
+
+        date_field = 'tradeDate' if 'tradeDate' in fields else 'date'
+        if (self.start_date is not None or self.end_date is not None) and date_field in fields:
+            i_date = fields.index(date_field)
+
+            def date_check(row):
+                d = cell(row, i_date)
+                if parse_date is not None and isinstance(d, str):
+                    try:
+                        d = parse_date(d)
+                    except ValueError:
+                        return False
+                return self.date_ok(d)
+            checks.append(date_check)
+
+        if (self.types is not None or self.skip_types) and 'type' in fields:
+            i_type = fields.index('type')
+            type_map = type_map or {}
+            checks.append(lambda row: self.type_ok(type_map.get(cell(row, i_type), cell(row, i_type))))
+
+        if self.securities is not None and 'security' in fields:
+            i_security = fields.index('security')
+            checks.append(lambda row: self.security_ok(cell(row, i_security)))
+
+        if not checks:
+            return None
+        return lambda row: all(check(row) for check in checks)
+
+
+def from_importer(importer, skip_types=()):
+    """Build the filter set in importer's config, or as its attributes (see the top of this file). skip_types are
+    added to 'filter_skip_types'."""
+    def setting(key):
+        return importer.config.get(key, getattr(importer, key, None))
+
+    return RowFilter(start_date=setting('filter_start_date'), end_date=setting('filter_end_date'),
+                     types=setting('filter_types'),
+                     skip_types=list(setting('filter_skip_types') or []) + list(skip_types),
+                     securities=setting('filter_securities'))
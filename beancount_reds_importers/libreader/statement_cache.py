@@ -0,0 +1,54 @@
+"""Process-wide cache of parsed input files, shared across importer instances."""
+
+from collections import OrderedDict
+from beancount_reds_importers.libreader import filebuffer
+
+# A single file is often handled by several importer instances: eg, an ofx file with several accounts is
+# identified and extracted by one vanguard.Importer per account_number, and a Schwab csv may be shared by
+# several Schwab importers. Each of these used to parse the entire file on its own.
+#
+# This cache holds the result of parsing a file (eg: the ofxparse object, or the raw petl table), keyed by the
+# file's identity (see filebuffer.file_identity()) and the parser used. The first importer to need a file
+# parses it, and every other importer selects its account or rows from the shared parse. Importers should
+# not hold on to the parsed object beyond what they select from it: the cache owns it.
+#
+# Memory is bounded via LRU eviction, by number of files and by the total size of the files on disk, so a
+# batch run over a large archive keeps only a few parsed files alive at a time.
+
+MAX_ENTRIES = 8
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class StatementCache():
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, filename, parser, parse):
+        """Return the parsed file. parser identifies how the file is parsed (eg: a reader's read_raw
+        function), and parse() is called to parse the file if it isn't in the cache."""
+        identity = filebuffer.file_identity(filename)
+        key = (identity, parser)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        parsed = parse()
+        self.entries[key] = parsed
+        self.size += identity[1]
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            (evicted_identity, _), _ = self.entries.popitem(last=False)
+            self.size -= evicted_identity[1]
+        return parsed
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+statements = StatementCache()
+
+
+def get(filename, parser, parse):
+    return statements.get(filename, parser, parse)
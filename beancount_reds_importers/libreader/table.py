@@ -0,0 +1,279 @@
+"""Materialized and streaming petl tables for beancount_reds_importers readers."""
+
+import collections
+import concurrent.futures
+import itertools
+import operator
+import petl as etl
+
+# petl tables are lazy: every pass over a table (len(), namedtuples(), indexing, each petl transform built on
+# it) re-runs the entire pipeline that produced it, all the way back to reading and parsing the file. Readers
+# instead materialize a table once, at the end of their pipeline, into a MaterializedTable. It is still a petl
+# table, so everything that works on petl tables works on it, but:
+#   - rows are held in a list, so len() and indexing don't iterate
+#   - namedtuples() returns a list of the rows as namedtuples, built once
+#   - column(field) returns a field's values, for column-at-a-time access
+#   - skip() and head() slice the list of rows, instead of building a lazy view over it
+#
+# select_rows() drops rows, the same way (eg: those a reader's filter rejects, see rowfilter.py).
+#
+# cutout_columns() drops columns, keeping a MaterializedTable materialized. Readers use it to drop the fields no
+# one uses (see reader.used_fields()), before converting the rest.
+#
+# convert_columns() is a batched replacement for chains of petl convert() calls: it converts a whole column
+# per call, instead of a cell at a time through one lazy petl layer per conversion.
+#
+# Once namedtuples() is called, rows are stored as the namedtuples themselves (namedtuples are tuples), so each
+# row is held only once.
+#
+# For files too large to hold in memory, readers have a streaming mode instead (see csvreader.py), built on
+# lazy views that only ever hold a bounded number of rows:
+#   - DropTailView: drops the last n rows, via a ring buffer of n rows, instead of counting rows up front
+#   - HeadUntilView: stops at the first row matching a predicate (eg: a blank line)
+#   - convert_columns() on a table that isn't materialized converts CHUNK_ROWS rows at a time
+
+CHUNK_ROWS = 10000
+
+
+class MaterializedTable(etl.Table):
+    def __init__(self, rows):
+        """rows: an iterable of rows, the first of which is the header, like any petl table"""
+        it = iter(rows)
+        first = next(it, None)
+        self.has_header = first is not None
+        self.fields = tuple(first) if self.has_header else ()
+        self.rows = list(map(tuple, it))
+        self.field_index = {}
+        for i, f in enumerate(self.fields):
+            self.field_index.setdefault(f, i)  # same as petl: the first of duplicate fields
+        self.rows_are_namedtuples = False
+
+    def __iter__(self):
+        if not self.has_header:
+            return
+        yield self.fields
+        yield from self.rows
+
+    def __len__(self):
+        # same as petl: includes the header
+        return len(self.rows) + 1 if self.has_header else 0
+
+    def __getitem__(self, item):
+        if isinstance(item, int):
+            # petl only has non-negative indexes. Negative ones count from the end, as for the list of all rows
+            if item < 0:
+                item += len(self)
+                if item < 0:
+                    raise IndexError('table index out of range')
+            return self.fields if item == 0 else self.rows[item - 1]
+        return super().__getitem__(item)
+
+    def header(self):
+        return self.fields
+
+    def namedtuples(self, *sliceargs, **kwargs):
+        if sliceargs or kwargs:
+            return super().namedtuples(*sliceargs, **kwargs)
+        if not self.rows_are_namedtuples:
+            self.rows = list(super().namedtuples())
+            self.rows_are_namedtuples = True
+        return self.rows
+
+    def skip(self, n):
+        # same as petl: skips n rows, including the header, so that the n-th row becomes the header
+        if n <= 0 or not self.has_header:
+            return self
+        return MaterializedTable(self.rows[n - 1:])
+
+    def head(self, n=5):
+        if not self.has_header:
+            return self
+        if n < 0:
+            raise ValueError(f"head() needs a non-negative number of rows, got {n}")
+        return MaterializedTable([self.fields] + self.rows[:n])
+
+    def column(self, field):
+        i = self.field_index[field]
+        return [row[i] for row in self.rows]
+
+    def is_rectangular(self):
+        width = len(self.fields)
+        return all(len(row) == width for row in self.rows)
+
+    def to_rows(self):
+        """Plain tuples, eg: for pickling (namedtuple classes created on the fly can't be pickled)"""
+        if not self.has_header:
+            return []
+        return [self.fields] + [tuple(row) for row in self.rows]
+
+
+def materialize(rdr):
+    """Run a petl pipeline once, and return the resulting table, materialized"""
+    if isinstance(rdr, MaterializedTable):
+        return rdr
+    return MaterializedTable(rdr)
+
+
+def cutout_columns(rdr, fields):
+    """Like petl's cutout(rdr, *fields), but fields not in the table are ignored, and a MaterializedTable is cut
+    eagerly, into a MaterializedTable"""
+    fields = set(fields)
+    if not isinstance(rdr, MaterializedTable):
+        fields = [f for f in rdr.header() if f in fields]
+        return rdr.cutout(*fields) if fields else rdr
+    keep = [i for i, f in enumerate(rdr.fields) if f not in fields]
+    if len(keep) == len(rdr.fields):
+        return rdr
+    header = tuple(rdr.fields[i] for i in keep)
+    if len(keep) > 1 and rdr.is_rectangular():
+        return MaterializedTable([header] + list(map(operator.itemgetter(*keep), rdr.rows)))
+    # short rows: fill in missing cells, like petl
+    return MaterializedTable([header] + [tuple(row[i] if i < len(row) else None for i in keep) for row in rdr.rows])
+
+
+def select_rows(rdr, predicate):
+    """The header and rows of rdr for which predicate(row) is true. A MaterializedTable is filtered eagerly, into a
+    MaterializedTable, else this returns a lazy view"""
+    if not isinstance(rdr, MaterializedTable):
+        return SelectView(rdr, predicate)
+    if not rdr.has_header:
+        return rdr
+    return MaterializedTable([rdr.fields] + list(filter(predicate, rdr.rows)))
+
+
+class SelectView(etl.Table):
+    def __init__(self, source, predicate):
+        self.source = source
+        self.predicate = predicate
+
+    def __iter__(self):
+        it = iter(self.source)
+        header = next(it, None)
+        if header is None:
+            return
+        yield tuple(header)
+        for row in it:
+            if self.predicate(row):
+                yield tuple(row)
+
+
+class DropTailView(etl.Table):
+    """All rows of source except the last n, holding at most n rows in memory"""
+    def __init__(self, source, n):
+        self.source = source
+        self.n = n
+
+    def __iter__(self):
+        it = iter(self.source)
+        header = next(it, None)
+        if header is None:
+            return
+        yield tuple(header)
+        if self.n <= 0:
+            yield from map(tuple, it)
+            return
+        buffer = collections.deque(maxlen=self.n)
+        for row in it:
+            if len(buffer) == self.n:
+                yield tuple(buffer[0])
+            buffer.append(row)
+
+
+class HeadUntilView(etl.Table):
+    """The header and rows of source, up to (but not including) the first row for which predicate is true"""
+    def __init__(self, source, predicate):
+        self.source = source
+        self.predicate = predicate
+
+    def __iter__(self):
+        it = iter(self.source)
+        header = next(it, None)
+        if header is None:
+            return
+        yield tuple(header)
+        for row in it:
+            if self.predicate(row):
+                return
+            yield tuple(row)
+
+
+class ConvertColumnsView(etl.Table):
+    """Lazy convert_columns(): converts CHUNK_ROWS rows of source at a time"""
+    def __init__(self, source, converters, chunk_rows):
+        self.source = source
+        self.converters = converters
+        self.chunk_rows = chunk_rows
+
+    def __iter__(self):
+        it = iter(self.source)
+        header = next(it, None)
+        if header is None:
+            return
+        fields = tuple(header)
+        yield fields
+        while True:
+            chunk = list(itertools.islice(it, self.chunk_rows))
+            if not chunk:
+                return
+            yield from convert_columns(MaterializedTable([fields] + chunk), self.converters).rows
+
+
+def convert_values(convert, values):
+    """Return the list of convert(v) for each of values. Like petl's convert(), values that fail to convert
+    become None."""
+    try:
+        return list(map(convert, values))
+    except Exception:
+        pass
+    converted = []
+    for v in values:
+        try:
+            converted.append(convert(v))
+        except Exception:
+            converted.append(None)
+    return converted
+
+
+def convert_columns(rdr, converters, chunk_rows=CHUNK_ROWS):
+    """Convert whole columns at a time. converters is a list of (field, convert) pairs, applied in order, where
+    convert takes the list of a column's values, and returns the list of converted values. Fields not in the
+    table are ignored. Like petl's convert(), cells missing from rows shorter than the header are left alone.
+    Returns a MaterializedTable, if rdr is one, else a lazy view that converts chunk_rows at a time."""
+    if not isinstance(rdr, MaterializedTable):
+        return ConvertColumnsView(rdr, converters, chunk_rows)
+    indexes = [(rdr.field_index[f], convert) for f, convert in converters if f in rdr.field_index]
+    if not indexes or not rdr.rows:
+        return rdr
+
+    if rdr.is_rectangular():
+        columns = list(zip(*rdr.rows))
+        for i, convert in indexes:
+            columns[i] = convert(columns[i])
+        return MaterializedTable([rdr.fields] + list(zip(*columns)))
+
+    # ragged rows: only convert the cells that are present
+    rows = [list(row) for row in rdr.rows]
+    for i, convert in indexes:
+        present = [row for row in rows if len(row) > i]
+        for row, v in zip(present, convert([row[i] for row in present])):
+            row[i] = v
+    return MaterializedTable([rdr.fields] + rows)
+
+
+def convert_chunk(fields, rows, converters):
+    return convert_columns(MaterializedTable([fields] + rows), converters).rows
+
+
+def convert_columns_parallel(rdr, converters, processes):
+    """convert_columns() in a pool of processes, each converting a chunk of rows. converters must be picklable
+    (eg: module level functions, or partials of them). Rows are put back together in their original order, so
+    the result is identical to convert_columns()."""
+    rdr = materialize(rdr)
+    if not rdr.rows:
+        return rdr
+    chunk_rows = -(-len(rdr.rows) // (processes * 4))  # a few chunks per process, to even out the load
+    chunks = [rdr.rows[i:i + chunk_rows] for i in range(0, len(rdr.rows), chunk_rows)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+        converted = pool.map(convert_chunk, itertools.repeat(rdr.fields), chunks, itertools.repeat(converters))
+        rows = [row for chunk in converted for row in chunk]
+    return MaterializedTable([rdr.fields] + rows)
@@ -0,0 +1,89 @@
+"""Tests for amounts.py"""
+
+from decimal import Decimal
+import pytest
+from beancount_reds_importers.libreader import amounts
+
+
+@pytest.mark.parametrize('s, expected, currency', [
+    # currency prefixes and suffixes
+    ('$1,234.56', '1234.56', '$'),
+    ('S$1,234.56', '1234.56', 'S$'),
+    ('USD 10', '10', 'USD'),
+    ('SGD 141.02', '141.02', 'SGD'),
+    ('10 USD', '10', 'USD'),
+    ('1.50€', '1.50', '€'),
+    ('1234.56', '1234.56', None),
+    ('.5', '0.5', None),
+    ('5.', '5', None),
+    ('+5.00', '5.00', None),
+    # minus signs, before or after the currency, or trailing, including unicode ones
+    ('-$5.00', '-5.00', '$'),
+    ('$-5.00', '-5.00', '$'),
+    ('5.00-', '-5.00', None),
+    ('– 5.00', '-5.00', None),
+    ('−5.00', '-5.00', None),
+    ('－$5.00', '-5.00', '$'),
+    # parentheses
+    ('(5.00)', '-5.00', None),
+    ('($1,000.00)', '-1000.00', '$'),
+    ('(-5.00)', '5.00', None),
+    # CR/DR suffixes
+    ('SGD 141.02 CR', '141.02', 'SGD'),
+    ('SGD 141.02 DR', '-141.02', 'SGD'),
+    ('141.02 dr', '-141.02', None),
+    ('141.02DR', '-141.02', None),
+    ('-141.02 DR', '141.02', None),
+])
+def test_parse(s, expected, currency):
+    assert amounts.parse(s) == Decimal(expected)
+    assert str(amounts.parse(s)) == expected
+    assert amounts.currency(s) == currency
+
+
+@pytest.mark.parametrize('x, expected', [
+    (Decimal('1.10'), Decimal('1.10')),
+    (5, Decimal(5)),
+    (None, Decimal()),
+    ('', Decimal()),
+    ('  ', Decimal()),
+])
+def test_parse_non_strings_and_blanks(x, expected):
+    assert amounts.parse(x) == expected
+
+
+@pytest.mark.parametrize('s', ['abc', '$', '-', '()', '(5.00', '5.00)', '1.2.3', '$5$', '--5', '1e5', 'Free',
+                               '5 - 3', '$(5.00)', '5,00.00.0'])
+def test_not_amounts(s):
+    assert amounts.tokenize(s) is None
+    assert amounts.currency(s) is None
+    with pytest.raises(ValueError):
+        amounts.parse(s)
+    with pytest.raises(ValueError):
+        amounts.minor_units(s)
+
+
+@pytest.mark.parametrize('s, places, expected', [
+    ('$-1,234.5', 2, -123450),
+    ('(0.01)', 2, -1),
+    ('10', 2, 1000),
+    ('10.500', 2, 1050),
+    ('1.2345', 4, 12345),
+    ('SGD 141.02 DR', 2, -14102),
+])
+def test_minor_units(s, places, expected):
+    assert amounts.minor_units(s, places) == expected
+
+
+def test_minor_units_rejects_extra_places():
+    with pytest.raises(ValueError):
+        amounts.minor_units('1.234')
+
+
+@pytest.mark.parametrize('debit, credit, expected', [
+    ('5.00', '', Decimal('-5.00')),
+    ('', '$1,000.00', Decimal('1000.00')),
+    ('', '', Decimal()),
+])
+def test_debit_credit(debit, credit, expected):
+    assert amounts.debit_credit(debit, credit) == expected
@@ -0,0 +1,89 @@
+"""Tests for csvreader.py"""
+
+import pytest
+from decimal import Decimal
+from beancount.ingest import cache
+from beancount_reds_importers.importers.schwab import schwab_csv_checking
+from beancount_reds_importers.libreader import csvreader
+from beancount_reds_importers.libreader import table
+
+STATEMENT = '''"Transactions  for Checking account 9999 as of 01/31/2023 10:00:00 ET"
+"Date","Type","Check #","Description","Withdrawal (-)","Deposit (+)","RunningBalance"
+"Pending Transactions are not included in account balance",,,,,,
+"Posted Transactions",,,,,,
+"01/30/2023","ACH","","PAYROLL","","$1,000.00","$5,000.00"
+"01/02/2023","ACH","","RENT","$2,000.00","","$4,000.00"
+"01/01/2023","ACH","","INTEREST","","$0.50","$6,000.00"
+'''
+
+
+def read_rows(directory, config):
+    """The converted rows of STATEMENT, read by an importer with config added to its own"""
+    directory.mkdir()
+    path = directory / 'Schwab_Checking_Transactions_20230131.csv'
+    path.write_text(STATEMENT)
+    importer = schwab_csv_checking.Importer({'account_number': '9999', 'main_account': 'Assets:Banks:Schwab',
+                                             'currency': 'USD', **config})
+    f = cache.get_file(str(path))
+    assert importer.identify(f)
+    importer.read_file(f)
+    return list(importer.rdr.namedtuples())
+
+
+@pytest.fixture
+def parallel_calls(monkeypatch):
+    """Count the calls to table.convert_columns_parallel()"""
+    calls = []
+    convert_columns_parallel = table.convert_columns_parallel
+
+    def spy(rdr, converters, processes):
+        calls.append((len(rdr.rows), processes))
+        return convert_columns_parallel(rdr, converters, processes)
+    monkeypatch.setattr(table, 'convert_columns_parallel', spy)
+    return calls
+
+
+@pytest.mark.parametrize('config, expected_calls', [
+    ({}, []),
+    ({'csv_processes': 2}, []),                                   # fewer rows than PARALLEL_MIN_ROWS
+    ({'csv_processes': 2, 'csv_parallel_min_rows': 4}, []),
+    ({'csv_processes': 2, 'csv_parallel_min_rows': 3}, [(3, 2)]),
+    ({'csv_processes': 2, 'csv_parallel_min_rows': 1, 'csv_streaming': True}, []),
+])
+def test_parallel_conversion_config(tmp_path, parallel_calls, config, expected_calls):
+    rows = read_rows(tmp_path / 'with_config', config)
+    assert parallel_calls == expected_calls
+    assert rows == read_rows(tmp_path / 'serial', {})
+    assert [row.amount for row in rows] == [Decimal('1000.00'), Decimal('-2000.00'), Decimal('0.50')]
+
+
+@pytest.mark.parametrize('x, expected', [
+    ('$1,234.56', Decimal('1234.56')),
+    ('-$5.00', Decimal('-5.00')),
+    ('', Decimal()),
+    (Decimal('1.10'), Decimal('1.10')),
+    # accounting notation is not read as negative (importers that need it use amounts.py)
+    ('(12.00)', Decimal('12.00')),
+    ('141.02 DR', Decimal('141.02')),
+])
+def test_currency_to_decimal(x, expected):
+    assert csvreader.currency_to_decimal(x) == expected
+
+
+def test_convert_currencies():
+    # values that fail to convert (eg: a trailing minus) become None, as with petl's convert()
+    assert csvreader.convert_currencies(['$1.00', '12.00-', '(3)']) == [Decimal('1.00'), None, Decimal('3')]
+
+
+@pytest.mark.parametrize('config, extra_fields, has_checknum', [
+    ({}, [], True),
+    ({'project_columns': False}, [], True),
+    ({'project_columns': True}, [], False),
+    ({'project_columns': True}, ['checknum'], True),
+])
+def test_column_projection(tmp_path, monkeypatch, config, extra_fields, has_checknum):
+    # banking's TRANSACTION_FIELDS doesn't include checknum
+    monkeypatch.setattr(schwab_csv_checking.Importer, 'extra_fields', extra_fields, raising=False)
+    rows = read_rows(tmp_path / 'rows', config)
+    assert ('checknum' in rows[0]._fields) == has_checknum
+    assert [row.amount for row in rows] == [Decimal('1000.00'), Decimal('-2000.00'), Decimal('0.50')]
@@ -0,0 +1,63 @@
+"""Tests for dates.py: its fast paths should parse exactly what datetime.strptime() parses"""
+
+import datetime
+import pytest
+from beancount_reds_importers.libreader import dates
+
+# variations of 2023-02-05 and of invalid dates, for each format. Each is also tried in upper and lower case
+SAMPLES = {
+    '%m/%d/%Y': ['02/05/2023', '2/5/2023', '02/5/2023', '2/05/2023', '02/30/2023', '02/29/2023', '02/29/2024',
+                 '13/01/2023', '00/10/2023', '12/00/2023', '12/32/2023', '12/31/0000', '12/31/0001', '1/1/23',
+                 '02/05/2023 ', ' 02/05/2023', '02-05-2023', '020/5/2023', '٠٢/٠٥/٢٠٢٣', ''],
+    '%d/%m/%Y': ['05/02/2023', '5/2/2023', '30/02/2023', '29/02/2024', '31/04/2023', '01/13/2023', '00/01/2023',
+                 '٠٥/٠٢/٢٠٢٣', '05/02/23'],
+    '%Y%m%d': ['20230205', '2023025', '20230230', '20231301', '20230100', '00000101', '202302051', '٢٠٢٣٠٢٠٥',
+               '2023-02-05'],
+    '%Y-%m-%d': ['2023-02-05', '2023-2-5', '2023-02-30', '2024-02-29', '2023-13-01', '2023-00-10', '0000-01-01',
+                 '٢٠٢٣-٠٢-٠٥', '2023/02/05'],
+    '%d %b %Y': ['05 Feb 2023', '5 Feb 2023', '05 feb 2023', '05 FEB 2023', '30 Feb 2023', '29 Feb 2024',
+                 '05 February 2023', '05 Fbr 2023', '05 Sept 2023', '00 Feb 2023', '5  Feb 2023', '٥ Feb ٢٠٢٣'],
+    '%B %d, %Y': ['February 05, 2023', 'February 5, 2023', 'february 5, 2023', 'Feb 5, 2023', 'February 30, 2023',
+                  'February 29, 2024', 'Febuary 5, 2023', 'May 1, 2023', 'February 5,2023', 'February ٥, ٢٠٢٣'],
+}
+
+
+def outcome(parse, s):
+    try:
+        return parse(s)
+    except ValueError as e:
+        return (ValueError, str(e))
+
+
+def every_day(date_format):
+    d = datetime.date(2023, 1, 1)
+    while d.year == 2023:
+        yield d.strftime(date_format)
+        d += datetime.timedelta(days=1)
+
+
+def test_every_format_is_tested():
+    assert set(SAMPLES) == set(dates.FAST_PATHS)
+
+
+@pytest.mark.parametrize('date_format', sorted(dates.FAST_PATHS))
+def test_fast_paths_as_strptime(date_format):
+    fast_path = dates.FAST_PATHS[date_format]()
+    samples = list(every_day(date_format)) + SAMPLES[date_format]
+    for s in samples + [s.upper() for s in samples] + [s.lower() for s in samples]:
+        expected = outcome(lambda s: datetime.datetime.strptime(s, date_format), s)
+        result = outcome(fast_path, s)
+        # None: the fast path doesn't handle s, and leaves it to strptime()
+        assert result is None or result == expected, s
+        assert outcome(dates.parser(date_format), s) == expected, s
+
+
+def test_parser_falls_back_to_strptime():
+    assert dates.parse('2023-02-05 10:30', '%Y-%m-%d %H:%M') == datetime.datetime(2023, 2, 5, 10, 30)
+    assert dates.parse('2/5/2023', '%m/%d/%Y') == datetime.datetime(2023, 2, 5)
+    for s in ['02/30/2023', '13/45/2023']:
+        with pytest.raises(ValueError) as e:
+            dates.parse(s, '%m/%d/%Y')
+        assert outcome(lambda s: datetime.datetime.strptime(s, '%m/%d/%Y'), s) == (ValueError, str(e.value))
+    with pytest.raises(TypeError):
+        dates.parse(None, '%m/%d/%Y')
@@ -0,0 +1,117 @@
+"""Tests for dispatch.py"""
+
+import io
+from beancount.ingest import cache
+from beancount_reds_importers.importers import ally
+from beancount_reds_importers.importers.schwab import schwab_csv_checking
+from beancount_reds_importers.libreader import dispatch
+
+STATEMENT = '''"Transactions  for Checking account 9999 as of 01/31/2023 10:00:00 ET"
+"Date","Type","Check #","Description","Withdrawal (-)","Deposit (+)","RunningBalance"
+"Posted Transactions",,,,,,
+"01/30/2023","ACH","","PAYROLL","","$1,000.00","$5,000.00"
+'''
+
+
+def checking(account_number='9999', **config):
+    return schwab_csv_checking.Importer(dict({'account_number': account_number,
+                                              'main_account': 'Assets:Banks:Schwab', 'currency': 'USD'}, **config))
+
+
+class PlainImporter():
+    """An importer that isn't built on the reader base class"""
+    def __init__(self):
+        self.calls = 0
+
+    def identify(self, file):
+        self.calls += 1
+        return False
+
+
+class CountingRegex():
+    def __init__(self, regex):
+        self.regex = regex
+        self.calls = 0
+
+    def match(self, s):
+        self.calls += 1
+        return self.regex.match(s)
+
+
+def statement_file(tmp_path, name='Schwab_Checking_Transactions_20230131.csv'):
+    path = tmp_path / name
+    path.write_text(STATEMENT)
+    return cache.get_file(str(path))
+
+
+def test_grouped_by_extension():
+    csv_importer, ofx_importer, plain = checking(), ally.Importer({'account_number': '1'}), PlainImporter()
+    index = dispatch.DispatchIndex([csv_importer, ofx_importer, plain])
+    assert list(index) == [csv_importer, ofx_importer, plain]
+    assert {ext: [spec.importer for spec in specs] for ext, specs in index.by_ext.items()} == {
+        'csv': [csv_importer], 'ofx': [ofx_importer], 'qfx': [ofx_importer]}
+    assert [spec.importer for spec in index.passthrough] == [plain]
+
+
+def test_candidates(tmp_path):
+    matching, other_account, plain = checking(), checking('1234'), PlainImporter()
+    ofx_importer = ally.Importer({'account_number': '9999'})
+    index = dispatch.DispatchIndex([matching, other_account, ofx_importer, plain])
+    f = statement_file(tmp_path)
+    # importers that aren't built on the reader base class are always candidates
+    assert index.find_candidates(f) == {id(matching), id(plain)}
+    assert matching.identify(f)
+    assert not other_account.identify(f)
+    assert not ofx_importer.identify(f)
+    assert not hasattr(ofx_importer, 'file')  # never looked at the file
+    assert [index.stats[id(i)].candidates for i in [matching, other_account, ofx_importer]] == [1, 0, 0]
+
+
+def test_filename_and_header_regexes_are_matched_separately(tmp_path):
+    by_header = checking(filename_pattern='.*')
+    by_header.compile_importer()
+    # the same pattern, as a filename_pattern: it matches the file's contents, but not its name
+    by_filename = checking(filename_pattern=by_header.header_identifier)
+    f = statement_file(tmp_path)
+    for importers in [[by_header, by_filename], [by_filename, by_header]]:
+        index = dispatch.DispatchIndex(importers)
+        assert by_filename.filename_regex is by_header.header_regex
+        assert index.find_candidates(f) == {id(by_header)}
+
+
+def test_each_regex_is_matched_once_per_file(tmp_path):
+    importers = [checking(), checking(), checking('1234')]
+    index = dispatch.DispatchIndex(importers)
+    filename_regex = CountingRegex(importers[0].filename_regex)
+    header_regexes = {}
+    for spec in index.specs:
+        spec.filename_regex = filename_regex
+        spec.header_regex = header_regexes.setdefault(spec.header_regex, CountingRegex(spec.header_regex))
+    f = statement_file(tmp_path)
+    for importer in importers:
+        importer.identify(f)
+    assert filename_regex.calls == 1
+    assert sorted(r.calls for r in header_regexes.values()) == [1, 1]
+
+    # a new file is matched again
+    g = statement_file(tmp_path, 'Schwab_Checking_Transactions_20230228.csv')
+    for importer in importers:
+        importer.identify(g)
+    assert filename_regex.calls == 2
+
+
+def test_report(tmp_path):
+    matching, other_account = checking(), checking('1234')
+    index = dispatch.DispatchIndex([other_account, matching])
+    f = statement_file(tmp_path)
+    for _ in range(2):
+        matching.identify(f)
+        other_account.identify(f)
+    out = io.StringIO()
+    index.report(file=out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith('Identify cost per importer')
+    assert len(lines) == 3
+    # most expensive first: only the matching importer ran its full identify()
+    assert lines[1].split()[1:5] == ['2', '2', '0', '2'] and lines[1].endswith('9999')
+    assert lines[2].split()[1:5] == ['2', '0', '0', '0'] and lines[2].endswith('1234')
@@ -0,0 +1,82 @@
+"""Tests for filebuffer.py"""
+
+import hashlib
+import os
+import pytest
+from beancount_reds_importers.libreader import filebuffer
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Files a to e, of 10 bytes each"""
+    paths = {}
+    for name in 'abcde':
+        paths[name] = str(tmp_path / name)
+        with open(paths[name], 'wb') as f:
+            f.write(name.encode() * 10)
+    return paths
+
+
+def kept(buffers):
+    return [os.path.basename(name) for name, size, mtime in buffers.buffers]
+
+
+def test_max_files(files):
+    buffers = filebuffer.FileBuffers(max_files=3)
+    for name in 'abcd':
+        assert buffers.get(files[name]) == name.encode() * 10
+    assert kept(buffers) == ['b', 'c', 'd']
+    buffers.get(files['b'])  # most recently used
+    buffers.get(files['e'])
+    assert kept(buffers) == ['d', 'b', 'e']
+    assert buffers.size == 30
+
+
+def test_max_bytes(files):
+    buffers = filebuffer.FileBuffers(max_bytes=25)
+    for name in 'abc':
+        buffers.get(files[name])
+    assert kept(buffers) == ['b', 'c']
+    # the most recently read file is always kept, even if it is larger than max_bytes
+    buffers.configure(max_bytes=5)
+    assert kept(buffers) == ['c']
+    assert buffers.size == 10
+    buffers.get(files['a'])
+    assert kept(buffers) == ['a']
+
+
+def test_configure(files):
+    buffers = filebuffer.FileBuffers()
+    for name in 'abcde':
+        buffers.get(files[name])
+    assert len(buffers.buffers) == 5
+    buffers.configure(max_files=2)
+    assert kept(buffers) == ['d', 'e']
+    assert (buffers.max_files, buffers.max_bytes) == (2, filebuffer.MAX_BYTES)
+
+
+def test_module_configure(files, monkeypatch):
+    monkeypatch.setattr(filebuffer, 'buffers', filebuffer.FileBuffers())
+    for name in 'abc':
+        filebuffer.read_bytes(files[name])
+    filebuffer.configure(max_files=1)
+    assert kept(filebuffer.buffers) == ['c']
+
+
+def test_content_hashes_are_evicted_with_buffers(files):
+    buffers = filebuffer.FileBuffers(max_files=2)
+    for name in 'abcde':
+        assert buffers.content_hash(files[name]) == hashlib.sha256(name.encode() * 10).hexdigest()
+        assert set(buffers.content_hashes) == set(buffers.buffers)
+    assert kept(buffers) == ['d', 'e']
+    buffers.clear()
+    assert not buffers.buffers and not buffers.content_hashes and buffers.size == 0
+
+
+def test_changed_files_are_read_again(files):
+    buffers = filebuffer.FileBuffers()
+    first_hash = buffers.content_hash(files['a'])
+    with open(files['a'], 'wb') as f:
+        f.write(b'changed')
+    assert buffers.get(files['a']) == b'changed'
+    assert buffers.content_hash(files['a']) == hashlib.sha256(b'changed').hexdigest() != first_hash
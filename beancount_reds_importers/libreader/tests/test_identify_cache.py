@@ -0,0 +1,61 @@
+"""Tests for identify_cache.py"""
+
+import os
+import pickle
+import shutil
+import pytest
+from beancount.ingest import cache
+from beancount_reds_importers.importers.schwab import schwab_csv_checking
+from beancount_reds_importers.libreader import dispatch
+from beancount_reds_importers.libreader import identify_cache
+
+STATEMENT = '''"Transactions  for Checking account 9999 as of 01/31/2023 10:00:00 ET"
+"Date","Type","Check #","Description","Withdrawal (-)","Deposit (+)","RunningBalance"
+"Pending Transactions are not included in account balance",,,,,,
+"Posted Transactions",,,,,,
+"01/30/2023","ACH","","PAYROLL","","$1,000.00","$5,000.00"
+"01/02/2023","ACH","","RENT","$2,000.00","","$4,000.00"
+'''
+
+
+def make_config(cache_dir):
+    importer = schwab_csv_checking.Importer({'account_number': '9999', 'main_account': 'Assets:Banks:Schwab',
+                                             'currency': 'USD'})
+    return dispatch.DispatchIndex([importer], cache_dir=cache_dir)
+
+
+def file_names(config, filenames):
+    names = []
+    for filename in filenames:
+        f = cache.get_file(filename)
+        importer = config[0]
+        assert importer.identify(f)
+        names.append(importer.file_name(f))
+    return names
+
+
+def test_identical_files_under_different_names(tmp_path):
+    first = tmp_path / 'Schwab_Checking_Transactions_20230101.csv'
+    first.write_text(STATEMENT)
+    second = tmp_path / 'Schwab_Checking_Transactions_20230102.csv'
+    shutil.copy(first, second)
+    filenames = [str(first), str(second)]
+    expected = [os.path.basename(f) for f in filenames]
+
+    cache_dir = str(tmp_path / 'cache')
+    assert file_names(make_config(cache_dir), filenames) == expected  # cold cache
+    assert file_names(make_config(cache_dir), filenames) == expected  # warm cache
+    assert file_names(make_config(cache_dir), filenames[::-1]) == expected[::-1]
+
+
+def test_write_atomic_leaves_no_temp_files(tmp_path):
+    path = str(tmp_path / 'entry.pickle')
+    identify_cache.write_atomic(path, {'identify': True})
+    with open(path, 'rb') as f:
+        assert pickle.load(f) == {'identify': True}
+
+    with pytest.raises(Exception):
+        identify_cache.write_atomic(path, {'unpicklable': lambda: None})
+    assert os.listdir(tmp_path) == ['entry.pickle']
+    with open(path, 'rb') as f:
+        assert pickle.load(f) == {'identify': True}
@@ -0,0 +1,90 @@
+"""Tests for ofxreader.py. The fixtures are ofxparse's own (see ofxparse_fixtures/LICENSE): they include ofx 1.x
+(sgml) files, some of which close their elements, and ofx 2.x (xml) files."""
+
+import datetime
+import glob
+import os
+import ofxparse
+import pytest
+import shutil
+from beancount.ingest import cache
+from beancount_reds_importers.importers import ally
+from beancount_reds_importers.libreader import ofxreader
+from beancount_reds_importers.libreader import ofxstream
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'ofxparse_fixtures')
+
+# ofxparse parses ofx as html, and warns about it
+pytestmark = pytest.mark.filterwarnings('ignore')
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURES, name)
+
+
+def sniffed(name):
+    return [(acc_id, currency, ofxstream.parse_datetime(end_date) if end_date else None)
+            for acc_id, currency, end_date in ofxreader.sniff_accounts(fixture_path(name))]
+
+
+@pytest.mark.parametrize('name', sorted(os.path.basename(f) for f in glob.glob(os.path.join(FIXTURES, '*.ofx'))))
+def test_sniff_accounts_as_ofxparse(name):
+    try:
+        with open(fixture_path(name), 'rb') as f:
+            ofx = ofxparse.OfxParser.parse(f)
+    except Exception:
+        pytest.skip('ofxparse rejects this file')
+    expected = []
+    for acc in ofx.accounts:
+        statement = getattr(acc, 'statement', None)
+        expected.append((acc.account_id, getattr(statement, 'currency', '').upper() or None,
+                         getattr(statement, 'end_date', None) or None))
+    assert sniffed(name) == expected
+
+
+@pytest.mark.parametrize('name, expected', [
+    # sgml
+    ('checking.ofx', [('1452687~7', 'USD', datetime.datetime(2013, 5, 25, 6, 0))]),
+    # sgml, with closed elements
+    ('investment_medium.ofx', [('ABC123', 'CAD', datetime.datetime(2009, 12, 16, 1, 20))]),
+    ('td_ameritrade.ofx', [('121212121', 'USD', datetime.datetime(2017, 12, 3))]),
+    # xml
+    ('suncorp.ofx', [('123456789', 'AUD', datetime.datetime(2013, 12, 15))]),
+    ('multiple_accounts.ofx', [('9100', 'USD', None), ('9200', 'USD', None)]),
+])
+def test_sniff_accounts(name, expected):
+    assert sniffed(name) == expected
+
+
+def test_sniff_accounts_skips_transfer_destinations(tmp_path):
+    path = tmp_path / 'transfer.ofx'
+    path.write_text('<OFX><STMTRS><CURDEF>USD</CURDEF><BANKACCTFROM><BANKID>1</BANKID><ACCTID>1234</ACCTID>'
+                    '</BANKACCTFROM><BANKTRANLIST><DTEND>20230131</DTEND><STMTTRN><BANKACCTTO><ACCTID>5678'
+                    '</ACCTID></BANKACCTTO></STMTTRN></BANKTRANLIST></STMTRS></OFX>')
+    assert ofxreader.sniff_accounts(str(path)) == [['1234', 'USD', '20230131']]
+
+
+def no_parse(*args, **kwargs):
+    raise AssertionError('the file was parsed')
+
+
+@pytest.mark.parametrize('name, account_number, currency, end_date', [
+    ('checking.ofx', '1452687~7', 'USD', datetime.datetime(2013, 5, 25, 6, 0)),                 # sgml
+    ('investment_medium.ofx', 'ABC123', 'CAD', datetime.datetime(2009, 12, 16, 1, 20)),        # closed sgml
+    ('suncorp.ofx', '123456789', 'AUD', datetime.datetime(2013, 12, 15)),                      # xml
+])
+def test_identify_and_file_date_without_parsing(tmp_path, monkeypatch, name, account_number, currency, end_date):
+    path = tmp_path / ('transactions_' + name)
+    shutil.copy(fixture_path(name), path)
+    importer = ally.Importer({'account_number': account_number, 'main_account': 'Assets:Bank',
+                              'currency': 'XXX'})
+    f = cache.get_file(str(path))
+    monkeypatch.setattr(ofxreader, 'parse_ofx', no_parse)
+    assert importer.identify(f)
+    assert importer.currency == currency
+    assert importer.file_date(f) == end_date
+    assert not importer.file_read_done
+
+    other = ally.Importer({'account_number': 'not' + account_number, 'main_account': 'Assets:Bank',
+                           'currency': 'XXX'})
+    assert not other.identify(f)
@@ -0,0 +1,96 @@
+"""Tests for ofxstream.py: it should give the same results as ofxparse, and reject the same files.
+
+The fixtures are ofxparse's own (see ofxparse_fixtures/LICENSE)."""
+
+import glob
+import io
+import os
+import re
+import pytest
+import ofxparse
+from beancount_reds_importers.libreader import ofxstream
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'ofxparse_fixtures')
+
+# ofxparse parses ofx as html, and warns about it
+pytestmark = pytest.mark.filterwarnings('ignore')
+
+
+def fixture_names():
+    return sorted(os.path.relpath(f, FIXTURES) for f in glob.glob(os.path.join(FIXTURES, '**', '*.ofx'),
+                                                                  recursive=True))
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def as_dict(obj):
+    """The attributes of an ofxparse object (and of those it holds), for comparison"""
+    if isinstance(obj, list):
+        return [as_dict(o) for o in obj]
+    if hasattr(obj, '__dict__'):
+        return (type(obj).__name__, {k: as_dict(v) for k, v in vars(obj).items()})
+    return obj
+
+
+def parse_both(data):
+    """Returns the results of ofxparse and ofxstream: an Ofx object, or the exception raised"""
+    results = []
+    for parse in [lambda: ofxparse.OfxParser.parse(io.BytesIO(data)), lambda: ofxstream.parse(data)]:
+        try:
+            results.append(parse())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+@pytest.mark.parametrize('name', fixture_names())
+def test_same_as_ofxparse(name):
+    expected, result = parse_both(read_fixture(name))
+    if isinstance(expected, Exception):
+        assert isinstance(result, ofxparse.OfxParserException)
+        return
+    assert as_dict(result.accounts) == as_dict(expected.accounts)
+    assert as_dict(getattr(result, 'security_list', None)) == as_dict(getattr(expected, 'security_list', None))
+
+
+def test_account_listing():
+    ofx = ofxstream.parse(read_fixture('account_listing_aggregation.ofx'))
+    assert [(a.account_id, a.type, a.desc) for a in ofx.accounts] == [
+        ('0000000001', ofxparse.AccountType.Bank, 'USAA SAVINGS'),
+        ('0000000002', ofxparse.AccountType.Bank, 'FOUR STAR CHECKING'),
+        ('00000000000003', ofxparse.AccountType.Bank, 'LINE OF CREDIT'),
+        ('4111111111111111', ofxparse.AccountType.CreditCard, 'MY CREDIT CARD')]
+    assert ofx.accounts[0].institution.organization == 'USAA'
+
+
+@pytest.mark.parametrize('name', ['fail_nice/empty_balance.ofx', 'fail_nice/date_missing.ofx',
+                                  'fail_nice/decimal_error.ofx', 'ofx-v102-empty-tags.ofx'])
+def test_rejects_malformed(name):
+    with pytest.raises(ofxparse.OfxParserException):
+        ofxstream.parse(read_fixture(name))
+
+
+def blanked_fields(data, blank):
+    """For each field (the first of each tag), data with its value replaced by blank"""
+    seen = set()
+    for m in re.finditer(rb'<([A-Z0-9.]+)>([^<\r\n]+)', data):
+        if m.group(1) not in seen:
+            seen.add(m.group(1))
+            yield m.group(1).decode(), data[:m.start(2)] + blank + data[m.end(2):]
+
+
+@pytest.mark.parametrize('blank', [b'', b' '])
+@pytest.mark.parametrize('name', ['account_listing_aggregation.ofx', 'anzcc.ofx', 'bank_medium.ofx', 'checking.ofx',
+                                  'fidelity.ofx', 'fidelity-savings.ofx', 'investment_medium.ofx',
+                                  'multiple_accounts2.ofx', 'suncorp.ofx', 'tiaacref.ofx', 'vanguard401k.ofx'])
+def test_empty_fields_as_ofxparse(name, blank):
+    for tag, data in blanked_fields(read_fixture(name), blank):
+        expected, result = parse_both(data)
+        if isinstance(expected, Exception):
+            assert isinstance(result, ofxparse.OfxParserException), tag
+        else:
+            assert not isinstance(result, Exception), (tag, result)
+            assert as_dict(result.accounts) == as_dict(expected.accounts), tag
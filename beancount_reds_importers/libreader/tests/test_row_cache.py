@@ -0,0 +1,140 @@
+"""Tests for row_cache.py"""
+
+import os
+import shutil
+import pytest
+from beancount.ingest import cache
+from beancount_reds_importers.importers.schwab import schwab_csv_checking
+from beancount_reds_importers.importers.schwab import schwab_ofx_brokerage
+from beancount_reds_importers.libreader import dispatch
+from beancount_reds_importers.libreader import ofxreader
+from beancount_reds_importers.libreader import row_cache
+from beancount_reds_importers.libreader import statement_cache
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'ofxparse_fixtures')
+
+# ofxparse parses ofx as html, and warns about it
+pytestmark = pytest.mark.filterwarnings('ignore')
+
+CONFIG = {'account_number': '9999', 'main_account': 'Assets:Banks:Schwab', 'currency': 'USD'}
+
+
+class Reads():
+    """A read() for RowCache.get(), that counts its calls"""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return [('date', 'amount'), ('2023-01-31', self.calls)]
+
+
+def cached_read(rows, config, path, reads):
+    importer = schwab_csv_checking.Importer(dict(config))
+    rows.add_importer(importer)
+    return rows.get(importer, cache.get_file(str(path)), reads)
+
+
+@pytest.fixture
+def statement(tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text('"Transactions  for Checking account 9999"\n')
+    return path
+
+
+def test_cached_until_content_changes(tmp_path, statement):
+    rows, reads = row_cache.RowCache(str(tmp_path / 'cache')), Reads()
+    assert cached_read(rows, CONFIG, statement, reads) == [('date', 'amount'), ('2023-01-31', 1)]
+    assert cached_read(rows, CONFIG, statement, reads) == [('date', 'amount'), ('2023-01-31', 1)]
+    # a new RowCache over the same directory, as in the next run
+    assert cached_read(row_cache.RowCache(str(tmp_path / 'cache')), CONFIG, statement, reads)[1][1] == 1
+    assert reads.calls == 1
+
+    statement.write_text('"Transactions  for Checking account 9999 as of 01/31/2023"\n')
+    assert cached_read(rows, CONFIG, statement, reads)[1][1] == 2
+    # the same content under another name shares the entry
+    shutil.copy(statement, tmp_path / 'copy.csv')
+    assert cached_read(rows, CONFIG, tmp_path / 'copy.csv', reads)[1][1] == 2
+    assert reads.calls == 2
+
+
+def test_config_keys(tmp_path, statement):
+    rows, reads = row_cache.RowCache(str(tmp_path / 'cache')), Reads()
+    cached_read(rows, CONFIG, statement, reads)
+    # keys that only transaction builders use don't affect what is read
+    for key in ['main_account', 'fund_info', 'csv_processes']:
+        assert key in row_cache.BUILDER_CONFIG_KEYS
+        cached_read(rows, dict(CONFIG, **{key: 'changed'}), statement, reads)
+    assert reads.calls == 1
+    # all others do
+    cached_read(rows, dict(CONFIG, currency='SGD'), statement, reads)
+    cached_read(rows, dict(CONFIG, filter_start_date='2023-01-01'), statement, reads)
+    assert reads.calls == 3
+
+
+def test_versions(tmp_path, statement, monkeypatch):
+    rows, reads = row_cache.RowCache(str(tmp_path / 'cache')), Reads()
+    cached_read(rows, CONFIG, statement, reads)
+    monkeypatch.setattr(row_cache, 'ROW_CACHE_VERSION', row_cache.ROW_CACHE_VERSION + 1)
+    cached_read(rows, CONFIG, statement, reads)
+    assert reads.calls == 2
+    monkeypatch.setattr(row_cache, 'package_versions', lambda: [('petl', '0.0')])
+    cached_read(rows, CONFIG, statement, reads)
+    assert reads.calls == 3
+    # the modules the importer is built from changed
+    fingerprint = row_cache.identify_cache.code_fingerprint
+    monkeypatch.setattr(row_cache.identify_cache, 'code_fingerprint', lambda cls: (fingerprint(cls), 'changed'))
+    cached_read(rows, CONFIG, statement, reads)
+    assert reads.calls == 4
+
+
+def test_unreadable_entry_is_read_again(tmp_path, statement):
+    rows, reads = row_cache.RowCache(str(tmp_path / 'cache')), Reads()
+    cached_read(rows, CONFIG, statement, reads)
+    [entry] = os.listdir(rows.cache_dir)
+    with open(os.path.join(rows.cache_dir, entry), 'wb') as f:
+        f.write(b'not a pickle')
+    assert cached_read(rows, CONFIG, statement, reads)[1][1] == 2
+
+
+def no_parse(*args, **kwargs):
+    raise AssertionError('the file was parsed')
+
+
+def brokerage_importer():
+    return schwab_ofx_brokerage.Importer({'account_number': '121212121', 'main_account': 'Assets:{ticker}',
+                                          'cash_account': 'Assets:{currency}', 'currency': 'USD',
+                                          'fund_info': {'fund_data': [], 'money_market': []}})
+
+
+def test_ofx_account_and_securities_from_cache(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'schwab_td_ameritrade.ofx'
+    shutil.copy(os.path.join(FIXTURES, 'td_ameritrade.ofx'), path)
+    f = cache.get_file(str(path))
+    cache_dir = str(tmp_path / 'cache')
+
+    importer = brokerage_importer()
+    dispatch.DispatchIndex([importer], cache_dir=cache_dir, cache_rows=True)
+    assert importer.identify(f)
+    importer.read_file(f)
+    expected = [(s.uniqueid, s.ticker) for s in importer.ofx.security_list]
+    assert expected
+    assert [(s.uniqueid, s.ticker) for s in importer.security_list] == expected
+
+    # the next run reads neither the account nor the securities from the file
+    statement_cache.statements.clear()
+    monkeypatch.setattr(ofxreader, 'parse_ofx', no_parse)
+    importer = brokerage_importer()
+    index = dispatch.DispatchIndex([importer], cache_dir=cache_dir, cache_rows=True)
+    assert importer.identify(f)
+    index.ensure_identified(importer, f)  # identify() was answered from the cache: as extract() does
+    importer.read_file(f)
+    assert importer.ofx_account.account_id == '121212121'
+    assert [(s.uniqueid, s.ticker) for s in importer.security_list] == expected
+
+    # securities missing from fund_info are listed without parsing the file either
+    importer.funds_db = {}
+    importer.get_security_list = lambda: [uniqueid for uniqueid, ticker in expected]
+    with pytest.raises(SystemExit):
+        importer.get_ticker_info_from_id(expected[0][0])
+    assert expected[0][1] in capsys.readouterr().err
@@ -0,0 +1,156 @@
+"""Tests for rowfilter.py"""
+
+import datetime
+from collections import namedtuple
+import pytest
+from beancount.ingest import cache
+from beancount_reds_importers.importers.schwab import schwab_csv_brokerage
+from beancount_reds_importers.libreader import dates
+from beancount_reds_importers.libreader import rowfilter
+
+START, END = datetime.date(2023, 1, 1), datetime.date(2023, 2, 1)
+
+
+@pytest.mark.parametrize('d, expected', [
+    (datetime.date(2022, 12, 31), False),
+    (datetime.date(2023, 1, 1), True),        # the start date is included
+    (datetime.datetime(2023, 1, 1, 0, 0), True),
+    (datetime.datetime(2023, 1, 31, 23, 59), True),
+    ('2023-01-31', True),
+    (datetime.date(2023, 2, 1), False),       # the end date is not
+    (datetime.datetime(2023, 2, 1, 0, 0), False),
+    ('2023-02-01', False),
+    ('not a date', False),
+    (None, False),
+])
+def test_date_boundaries(d, expected):
+    assert rowfilter.RowFilter(start_date=START, end_date=END).date_ok(d) == expected
+
+
+def test_open_ended_dates():
+    assert rowfilter.RowFilter(start_date='2023-01-01').date_ok(datetime.date(2099, 1, 1))
+    assert not rowfilter.RowFilter(start_date='2023-01-01').date_ok(datetime.date(2022, 12, 31))
+    assert rowfilter.RowFilter(end_date='2023-02-01').date_ok(datetime.date(1900, 1, 1))
+    assert not rowfilter.RowFilter(end_date='2023-02-01').date_ok(datetime.date(2023, 2, 1))
+    # without a date filter, dates aren't looked at
+    assert rowfilter.RowFilter(types=['buystock']).date_ok('not a date')
+
+
+def test_row_predicate_dates():
+    predicate = rowfilter.RowFilter(start_date=START, end_date=END).row_predicate(
+        ['date', 'amount'], parse_date=dates.parser('%m/%d/%Y'))
+    rows = [('12/31/2022', '1'), ('01/01/2023', '2'), ('1/31/2023', '3'), ('02/01/2023', '4'), ('Total', '5'), ()]
+    assert [row for row in rows if predicate(row)] == [('01/01/2023', '2'), ('1/31/2023', '3')]
+
+
+def test_row_predicate_prefers_trade_date():
+    predicate = rowfilter.RowFilter(start_date=START, end_date=END).row_predicate(
+        ['date', 'tradeDate'], parse_date=dates.parser('%m/%d/%Y'))
+    assert predicate(('02/02/2023', '01/31/2023'))
+    assert not predicate(('01/31/2023', '02/02/2023'))
+
+
+def test_types_and_skip_types():
+    type_map = {'Buy': 'buystock', 'Sell': 'sellstock', 'Cash Dividend': 'dividends'}
+    rf = rowfilter.RowFilter(types=['buystock', 'sellstock', 'Journal'], skip_types=['sellstock', 'Journal'])
+    predicate = rf.row_predicate(['type'], type_map=type_map)
+    # types are checked after transaction_type_map. Unmapped types are checked as they are
+    assert [t for t in ['Buy', 'Sell', 'Cash Dividend', 'Journal', 'buystock'] if predicate((t,))] == \
+        ['Buy', 'buystock']
+    assert rf.type_ok('buystock') and not rf.type_ok('sellstock') and not rf.type_ok('dividends')
+
+    predicate = rowfilter.RowFilter(skip_types=['Journal']).row_predicate(['date', 'type'], type_map=type_map)
+    assert predicate(('anything', 'Buy'))
+    assert not predicate(('anything', 'Journal'))
+
+
+def test_securities():
+    predicate = rowfilter.RowFilter(securities=['VTI']).row_predicate(['security', 'units'])
+    assert predicate(('VTI', '1'))
+    assert not predicate(('VXUS', '1'))
+
+
+def test_nothing_to_check():
+    assert rowfilter.RowFilter().is_empty()
+    assert rowfilter.RowFilter().row_predicate(['date']) is None
+    # filtered fields that the table doesn't have
+    assert rowfilter.RowFilter(start_date=START, securities=['VTI']).row_predicate(['amount']) is None
+
+
+def test_accepts():
+    Transaction = namedtuple('Transaction', ['date', 'tradeDate', 'type', 'security'])
+    rf = rowfilter.RowFilter(start_date=START, end_date=END, skip_types=['dividends'])
+    assert rf.accepts(Transaction(datetime.datetime(2023, 2, 5), datetime.datetime(2023, 1, 31), 'buystock', 'VTI'))
+    assert not rf.accepts(Transaction(datetime.datetime(2023, 1, 5), datetime.datetime(2023, 2, 1), 'buystock', 'VTI'))
+    assert not rf.accepts(Transaction(datetime.datetime(2023, 1, 5), None, 'dividends', 'VTI'))
+    assert rf.accepts(Transaction(datetime.datetime(2023, 1, 5), None, 'buystock', 'VTI'))
+
+
+def test_from_importer():
+    class Importer:
+        config = {'filter_start_date': '2023-01-01', 'filter_skip_types': ['dividends']}
+        filter_start_date = datetime.date(2000, 1, 1)
+        filter_end_date = datetime.date(2023, 2, 1)
+
+    rf = rowfilter.from_importer(Importer(), skip_types=['Journal'])
+    assert rf.start_date == START   # config takes precedence over attributes
+    assert rf.end_date == END
+    assert rf.skip_types == {'dividends', 'Journal'}
+    assert rf.types is None and rf.securities is None
+
+
+# schwab_csv_brokerage imports only the month in its 'ym' config. It used to select rows whose date (a string,
+# eg: '01/31/2023') started with the month, and ended with the year, in prepare_table()
+def old_ym_select(ym, d):
+    year, month = ym.split('-', 2)
+    return d.startswith(month) and d.endswith(year)
+
+
+def brokerage_importer(ym):
+    return schwab_csv_brokerage.Importer({'account_number': 'AKSO 2993-9772', 'ym': ym, 'currency': 'USD',
+                                          'main_account': 'Assets:Schwab:{ticker}',
+                                          'cash_account': 'Assets:Schwab:{currency}',
+                                          'fund_info': {'fund_data': [], 'money_market': []}})
+
+
+@pytest.mark.parametrize('ym', ['2022-12', '2023-01', '2023-02', '2023-06', '2023-11', '2023-12'])
+def test_schwab_brokerage_ym(ym):
+    importer = brokerage_importer(ym)
+    importer.custom_init()
+    year, month = map(int, ym.split('-'))
+    assert importer.filter_start_date == datetime.date(year, month, 1)
+    assert importer.filter_end_date == (datetime.date(year + 1, 1, 1) if month == 12 else
+                                        datetime.date(year, month + 1, 1))
+
+    rf = rowfilter.RowFilter(importer.filter_start_date, importer.filter_end_date)
+    d = datetime.date(2022, 11, 1)
+    while d < datetime.date(2024, 2, 1):
+        s = d.strftime('%m/%d/%Y')
+        assert rf.date_ok(dates.parse(s, '%m/%d/%Y')) == old_ym_select(ym, s), s
+        d += datetime.timedelta(days=1)
+
+
+STATEMENT = '''"Transactions  for account Kevet Schwab One ...772 as of 02/02/2023 10:00:00 ET"
+"Date","Action","Symbol","Description","Quantity","Price","Fees & Comm","Amount",
+"02/01/2023","Buy","SCHF","SCHWAB INTL EQUITY","1","$34.00","","-$34.00",
+"01/31/2023","Buy","SCHF","SCHWAB INTL EQUITY","10","$33.50","","-$335.00",
+"01/20/2023 as of 01/19/2023","Cash Dividend","SCHF","SCHWAB INTL EQUITY","","","","$12.34",
+"01/10/2023","Journal","","JOURNAL","","","","$5.00",
+"01/01/2023","MoneyLink Transfer","","Tfr BANK","","","","$1,000.00",
+"12/31/2022","Sell","SCHF","SCHWAB INTL EQUITY","5","$32.00","$0.50","$159.50",
+"Transactions Total","","","","","","","$808.84",
+'''
+
+
+def test_schwab_brokerage_reads_only_ym(tmp_path):
+    path = tmp_path / 'X_Transactions_20230202.csv'
+    path.write_text(STATEMENT)
+    importer = brokerage_importer('2023-01')
+    f = cache.get_file(str(path))
+    assert importer.identify(f)
+    importer.read_file(f)
+    # Journal rows are dropped too: they are in skip_transaction_types
+    assert [(row.date.date(), row.type) for row in importer.rdr.namedtuples()] == [
+        (datetime.date(2023, 1, 31), 'buystock'),
+        (datetime.date(2023, 1, 20), 'dividends'),
+        (datetime.date(2023, 1, 1), 'transfer')]
@@ -0,0 +1,95 @@
+"""Tests for statement_cache.py"""
+
+import os
+import shutil
+import pytest
+from beancount.ingest import cache
+from beancount_reds_importers.importers import ally
+from beancount_reds_importers.libreader import ofxreader
+from beancount_reds_importers.libreader import statement_cache
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'ofxparse_fixtures')
+
+# ofxparse parses ofx as html, and warns about it
+pytestmark = pytest.mark.filterwarnings('ignore')
+
+
+class Parses():
+    """A parse() for StatementCache.get(), that counts its calls"""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_keyed_by_file_and_parser(tmp_path):
+    statements, parses = statement_cache.StatementCache(), Parses()
+    a = write(tmp_path / 'a', b'a' * 10)
+    assert statements.get(a, 'ofxparse', parses) == 1
+    assert statements.get(a, 'ofxparse', parses) == 1
+    assert statements.get(a, 'stream', parses) == 2
+    # the same file, changed on disk
+    write(a, b'changed')
+    assert statements.get(a, 'ofxparse', parses) == 3
+    assert statements.get(a, 'ofxparse', parses) == 3
+    assert parses.calls == 3
+
+
+def test_eviction(tmp_path):
+    statements, parses = statement_cache.StatementCache(max_entries=2, max_bytes=25), Parses()
+    a, b, c = (write(tmp_path / name, name.encode() * 10) for name in 'abc')
+    statements.get(a, 'parser', parses)
+    statements.get(b, 'parser', parses)
+    statements.get(a, 'parser', parses)  # most recently used
+    statements.get(c, 'parser', parses)
+    assert [os.path.basename(identity[0]) for identity, parser in statements.entries] == ['a', 'c']
+    assert statements.size == 20
+    assert parses.calls == 3
+    statements.get(b, 'parser', parses)
+    assert parses.calls == 4
+
+    # by size: the most recent entry is always kept, even if it is larger than max_bytes
+    big = write(tmp_path / 'big', b'x' * 30)
+    statements.get(big, 'parser', parses)
+    assert [os.path.basename(identity[0]) for identity, parser in statements.entries] == ['big']
+    assert statements.size == 30
+
+
+def test_importers_share_one_parse(tmp_path, monkeypatch):
+    monkeypatch.setattr(statement_cache, 'statements', statement_cache.StatementCache())
+    parses = []
+
+    def counting_parse_ofx(filename, parser='ofxparse'):
+        parses.append(filename)
+        return parse_ofx(filename, parser)
+    parse_ofx = ofxreader.parse_ofx
+    monkeypatch.setattr(ofxreader, 'parse_ofx', counting_parse_ofx)
+
+    path = tmp_path / 'transactions.ofx'
+    shutil.copy(os.path.join(FIXTURES, 'multiple_accounts.ofx'), path)
+    f = cache.get_file(str(path))
+    importers = [ally.Importer({'account_number': n, 'main_account': 'Assets:Bank', 'currency': 'USD'})
+                 for n in ['9100', '9200']]
+    for importer in importers:
+        assert importer.identify(f)
+        importer.read_file(f)
+    assert [importer.ofx_account.account_id for importer in importers] == ['9100', '9200']
+    assert len(parses) == 1
+
+    # a changed file is parsed again
+    with open(path, 'ab') as out:
+        out.write(b'\n')
+    f = cache.get_file(str(path))
+    for importer in importers:
+        importer.file_read_done = False
+        importer.read_file(f)
+    assert [importer.ofx_account.account_id for importer in importers] == ['9100', '9200']
+    assert len(parses) == 2
@@ -0,0 +1,146 @@
+"""Tests for table.py: its tables and operations should give the same results as the petl ones they replace"""
+
+import decimal
+import functools
+import petl as etl
+import pytest
+from beancount_reds_importers.libreader import table
+
+# includes short and long rows, which petl leaves as they are
+ROWS = [('date', 'amount', 'memo'),
+        ('01/02/2023', '1.50', 'a'),
+        ('01/03/2023', 'bad', 'b'),
+        ('01/04/2023', '2.25'),
+        ('01/05/2023', '-3', 'c', 'extra'),
+        ('', '', ''),
+        ('01/06/2023', '4', 'd')]
+
+
+def as_lists(rdr):
+    return [tuple(row) for row in rdr]
+
+
+def to_decimal(v):
+    return decimal.Decimal(v)
+
+
+def column_converter(convert):
+    """convert_columns() converts whole columns: wrap a per-value converter, as petl's convert() takes"""
+    return lambda values: table.convert_values(convert, values)
+
+
+@pytest.mark.parametrize('rows', [ROWS, ROWS[:1], []])
+def test_materialized_table_as_petl(rows):
+    expected = etl.wrap(rows)
+    result = table.MaterializedTable(rows)
+    assert as_lists(result) == as_lists(expected)
+    assert len(result) == len(expected)
+    if rows:
+        assert result.header() == expected.header()
+        assert [result[i] for i in range(len(rows))] == [expected[i] for i in range(len(rows))]
+        assert [result[i] for i in range(-len(rows), 0)] == as_lists(expected)
+        assert [tuple(r) for r in result.namedtuples()] == [tuple(r) for r in expected.namedtuples()]
+
+
+@pytest.mark.parametrize('n', range(0, len(ROWS) + 2))
+def test_skip_and_head_as_petl(n):
+    rdr = table.MaterializedTable(ROWS)
+    assert as_lists(rdr.skip(n)) == as_lists(etl.wrap(ROWS).skip(n))
+    assert as_lists(rdr.head(n)) == as_lists(etl.wrap(ROWS).head(n))
+    assert isinstance(rdr.skip(n), table.MaterializedTable)
+
+
+def test_namedtuples_are_kept():
+    rdr = table.MaterializedTable(ROWS[:3])
+    assert rdr.namedtuples() is rdr.namedtuples()
+    assert rdr.namedtuples()[1].amount == 'bad'
+    assert rdr[1] == ('01/02/2023', '1.50', 'a')
+
+
+@pytest.mark.parametrize('fields', [['memo'], ['date', 'memo'], ['not_a_field'], ['amount', 'not_a_field']])
+def test_cutout_columns_as_petl(fields):
+    # with nothing to cut, the table is returned as it is
+    cut = [f for f in fields if f in ROWS[0]]
+    expected = etl.wrap(ROWS).cutout(*cut) if cut else etl.wrap(ROWS)
+    assert as_lists(table.cutout_columns(table.MaterializedTable(ROWS), fields)) == as_lists(expected)
+    assert as_lists(table.cutout_columns(etl.wrap(ROWS), fields)) == as_lists(expected)
+
+
+def test_select_rows_as_petl():
+    def predicate(row):
+        return row[0] != ''
+    expected = etl.wrap(ROWS).select(predicate)
+    assert as_lists(table.select_rows(table.MaterializedTable(ROWS), predicate)) == as_lists(expected)
+    assert as_lists(table.select_rows(etl.wrap(ROWS), predicate)) == as_lists(expected)
+
+
+def test_convert_columns_as_petl():
+    # errors become None, and cells missing from short rows are left alone
+    expected = etl.wrap(ROWS).convert('amount', to_decimal).convert('memo', str.upper)
+    converters = [('amount', column_converter(to_decimal)), ('memo', column_converter(str.upper)),
+                  ('not_a_field', column_converter(int))]
+    result = table.convert_columns(table.MaterializedTable(ROWS), converters)
+    assert as_lists(result) == as_lists(expected)
+    assert result[2] == ('01/03/2023', None, 'B')
+    assert result[3] == ('01/04/2023', decimal.Decimal('2.25'))
+
+    rectangular = [row[:3] for row in ROWS if len(row) >= 3]
+    expected = etl.wrap(rectangular).convert('amount', to_decimal)
+    result = table.convert_columns(table.MaterializedTable(rectangular), [('amount', column_converter(to_decimal))])
+    assert as_lists(result) == as_lists(expected)
+
+
+# streaming views: the petl operations they replace are those used by csvreader in its default (materialized)
+# mode, and they are fed a lazy petl table, as in streaming mode
+
+@pytest.mark.parametrize('n', range(0, len(ROWS)))
+def test_drop_tail_view_as_petl(n):
+    expected = etl.wrap(ROWS).head(len(etl.wrap(ROWS)) - n - 1)
+    assert as_lists(table.DropTailView(etl.wrap(ROWS), n)) == as_lists(expected)
+
+
+def test_drop_tail_view_of_more_rows_than_the_table():
+    assert as_lists(table.DropTailView(etl.wrap(ROWS), len(ROWS) + 5)) == [ROWS[0]]
+    assert as_lists(table.DropTailView(etl.wrap([]), 2)) == []
+
+
+def head_until_blank(rdr):
+    """csvreader.extract_table_with_header(), on a petl table"""
+    nrows = len(rdr)
+    for (n, r) in enumerate(rdr):
+        if not r or all(i == '' for i in r):
+            nrows = n - 1
+            break
+    return rdr.head(nrows)
+
+
+@pytest.mark.parametrize('rows', [ROWS, [row for row in ROWS if any(row)], ROWS[:1], []])
+def test_head_until_view_as_petl(rows):
+    def is_blank_row(row):
+        return not row or all(i == '' for i in row)
+    expected = head_until_blank(etl.wrap(rows)) if rows else []
+    assert as_lists(table.HeadUntilView(etl.wrap(rows), is_blank_row)) == as_lists(expected)
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 4, table.CHUNK_ROWS])
+def test_convert_columns_view_as_petl(chunk_rows):
+    expected = etl.wrap(ROWS).convert('amount', to_decimal).convert('date', lambda v: v[-4:])
+    converters = [('amount', column_converter(to_decimal)), ('date', column_converter(lambda v: v[-4:]))]
+    result = table.convert_columns(etl.wrap(ROWS), converters, chunk_rows=chunk_rows)
+    assert isinstance(result, table.ConvertColumnsView)
+    assert as_lists(result) == as_lists(expected)
+    assert as_lists(result) == as_lists(table.convert_columns(table.MaterializedTable(ROWS), converters))
+
+
+@pytest.mark.parametrize('processes', [1, 2, 3])
+def test_convert_columns_parallel_as_serial(processes):
+    # converters must be picklable: partials of module level functions, as csvreader's are
+    rows = [ROWS[0]] + ROWS[1:] * 7
+    converters = [('amount', functools.partial(table.convert_values, to_decimal)),
+                  ('memo', functools.partial(table.convert_values, str.upper))]
+    expected = table.convert_columns(table.MaterializedTable(rows), converters)
+    result = table.convert_columns_parallel(etl.wrap(rows), converters, processes)
+    assert isinstance(result, table.MaterializedTable)
+    assert as_lists(result) == as_lists(expected)
+    assert as_lists(table.convert_columns_parallel(table.MaterializedTable(ROWS[:1]), converters, processes)) == \
+        [ROWS[0]]
@@ -0,0 +1,129 @@
+"""Tests for transforms.py: its steps should give the same results as the petl chains they replace"""
+
+import decimal
+import petl as etl
+import pytest
+from petl.transform.basics import TransformError
+from beancount_reds_importers.libreader import amounts
+from beancount_reds_importers.libreader import transforms
+
+# includes padded cells, a short and a long row, an empty row, and cells that don't convert
+ROWS = [('Date', 'Description', 'Amount', 'Ccy Amount'),
+        (' 01/02/2023 ', 'COFFEE\t', '1.50', 'SGD 1.50 DR'),
+        ('01/03/2023', ' REFUND ', 'bad', 'SGD 141.02 CR'),
+        ('01/04/2023', 'SHORT', '2.25'),
+        ('01/05/2023', 'LONG', '-3', 'USD 3.00', 'extra'),
+        ('', '', '', ''),
+        ('01/06/2023', 'NONE', None, 'nothing')]
+
+
+def as_lists(rdr):
+    return [tuple(row) for row in rdr]
+
+
+def assert_same(transform, petl_chain, rows=ROWS):
+    assert as_lists(transform.apply(etl.wrap(rows))) == as_lists(petl_chain(etl.wrap(rows)))
+
+
+def strip_cell(v):
+    return v.strip(' \t') if isinstance(v, str) else v
+
+
+def test_strip():
+    assert_same(transforms.Transform().strip(' \t'), lambda rdr: rdr.convertall(strip_cell))
+    assert_same(transforms.Transform().strip(), lambda rdr: rdr.convertall(lambda v: v.strip() if v else v))
+
+
+def test_convert_and_convertall():
+    # failed conversions become None
+    assert_same(transforms.Transform().convert('Amount', decimal.Decimal),
+                lambda rdr: rdr.convert('Amount', decimal.Decimal))
+    assert_same(transforms.Transform().convert(1, str.lower), lambda rdr: rdr.convert(1, str.lower))
+    assert_same(transforms.Transform().convertall(str.upper), lambda rdr: rdr.convertall(str.upper))
+    # on short rows, the missing cell is left missing
+    assert_same(transforms.Transform().convert('Ccy Amount', str.lower),
+                lambda rdr: rdr.convert('Ccy Amount', str.lower))
+    with pytest.raises(etl.errors.FieldSelectionError):
+        list(transforms.Transform().convert('not_a_field', str.lower).apply(etl.wrap(ROWS)))
+
+
+def test_select():
+    def where(r):
+        return r['Date'] != '' and r.Description != 'LONG' and r[2] != 'bad'
+    assert_same(transforms.Transform().select(where), lambda rdr: rdr.select(where))
+    # missing cells of short rows are None, as in petl's records
+    assert_same(transforms.Transform().select(lambda r: r['Ccy Amount'] is None),
+                lambda rdr: rdr.select(lambda r: r['Ccy Amount'] is None))
+    assert_same(transforms.Transform().select(lambda x: any([i != '' for i in x])),
+                lambda rdr: rdr.select(lambda x: any([i != '' for i in x])))
+
+
+def test_addfield():
+    assert_same(transforms.Transform().addfield('memo', ''), lambda rdr: rdr.addfield('memo', ''))
+    rows = [row for row in ROWS if len(row) == 4]
+    assert_same(transforms.Transform().addfield('ccy', lambda r: r['Ccy Amount'][:3]).addfield('n', lambda r: r[2]),
+                lambda rdr: rdr.addfield('ccy', lambda r: r['Ccy Amount'][:3]).addfield('n', lambda r: r[2]),
+                rows=rows)
+
+
+def test_addfield_failure_is_none():
+    # petl's addfield() raises instead
+    result = as_lists(transforms.Transform().addfield('amount', lambda r: amounts.parse(r['Amount']))
+                      .apply(etl.wrap(ROWS)))
+    assert result[0][-1] == 'amount'
+    assert [row[-1] for row in result[1:]] == [decimal.Decimal('1.50'), None, decimal.Decimal('2.25'),
+                                               decimal.Decimal('-3'), decimal.Decimal(), decimal.Decimal()]
+    with pytest.raises(ValueError):
+        list(etl.wrap(ROWS).addfield('amount', lambda r: amounts.parse(r['Amount'])))
+
+
+def test_capture():
+    rows = [row for row in ROWS if len(row) == 4]
+    for include_original in [False, True]:
+        assert_same(transforms.Transform().capture('Ccy Amount', '(.*) (.*)', ['ccy', 'amt'], fill=' ',
+                                                   include_original=include_original),
+                    lambda rdr: rdr.capture('Ccy Amount', '(.*) (.*)', ['ccy', 'amt'], fill=' ',
+                                            include_original=include_original),
+                    rows=rows)
+    # without fill, values that don't match fail, as in petl
+    with pytest.raises(TransformError):
+        list(transforms.Transform().capture('Ccy Amount', '(.*) (.*) (.*)', ['a', 'b', 'c']).apply(etl.wrap(rows)))
+    with pytest.raises(TransformError):
+        list(etl.wrap(rows).capture('Ccy Amount', '(.*) (.*) (.*)', ['a', 'b', 'c']))
+
+
+def test_rename_and_cutout():
+    mapping = {'Date': 'date', 'Description': 'payee', 'not_a_field': 'x'}
+    assert_same(transforms.Transform().rename(mapping), lambda rdr: rdr.rename(mapping, strict=False))
+    assert_same(transforms.Transform().cutout('Amount'), lambda rdr: rdr.cutout('Amount'))
+    assert_same(transforms.Transform().cutout('Date', 'Ccy Amount'), lambda rdr: rdr.cutout('Date', 'Ccy Amount'))
+
+
+def test_negate():
+    assert_same(transforms.Transform().negate('Amount'),
+                lambda rdr: rdr.convert('Amount', lambda v: -1 * amounts.parse(v)))
+
+
+def test_chain():
+    """A prepare_raw_file() and prepare_table() chain, as importers use it"""
+    def petl_chain(rdr):
+        rdr = rdr.convertall(strip_cell)
+        rdr = rdr.select(lambda x: any([i != '' for i in x]))
+        rdr = rdr.select(lambda r: r['Date'] != '01/05/2023')
+        rdr = rdr.capture('Ccy Amount', '(.*) (.*)', ['ccy', 'amt'], fill=' ', include_original=True)
+        rdr = rdr.cutout('Ccy Amount')
+        rdr = rdr.convert('Description', str.title)
+        rdr = rdr.addfield('memo', '')
+        return rdr.rename({'Date': 'date'})
+    transform = transforms.Transform().strip(' \t').select(lambda x: any([i != '' for i in x]))
+    transform.select(lambda r: r['Date'] != '01/05/2023')
+    transform.capture('Ccy Amount', '(.*) (.*)', ['ccy', 'amt'], fill=' ', include_original=True)
+    transform.cutout('Ccy Amount').convert('Description', str.title).addfield('memo', '').rename({'Date': 'date'})
+    assert_same(transform, petl_chain, rows=[row for row in ROWS if len(row) == 4])
+
+
+def test_empty_tables():
+    transform = transforms.Transform().strip().addfield('memo', '').cutout('Amount')
+    assert_same(transform, lambda rdr: rdr.convertall(strip_cell).addfield('memo', '').cutout('Amount'),
+                rows=ROWS[:1])
+    assert as_lists(transform.apply(etl.wrap([]))) == []
@@ -0,0 +1,83 @@
+"""Tests for xlsx_multitable_reader.py"""
+
+import re
+import zipfile
+import openpyxl
+import pytest
+from openpyxl.worksheet import _reader
+from beancount_reds_importers.libreader import xlsx_multitable_reader
+
+SHEET = [['Payslip Information'],
+         ['Name', 'Pay Date', 'Net Pay', None],
+         ['John Doe', '01/15/2023', 1234.5, None],
+         [],
+         ['Earnings'],
+         ['Description', 'Amount', 'Hours', 'Rate', 'Note'],
+         ['Salary', 2000, 80, 25, None]]
+
+
+def write_xlsx(path, dimension=None):
+    """Write SHEET to path. dimension overrides the used range the file declares, as some writers get it wrong"""
+    wb = openpyxl.Workbook()
+    for row in SHEET:
+        wb.active.append(row)
+    wb.save(path)
+    if dimension is not None:
+        with zipfile.ZipFile(path) as z:
+            contents = {name: z.read(name) for name in z.namelist()}
+        sheet = 'xl/worksheets/sheet1.xml'
+        contents[sheet], n = re.subn(rb'<dimension ref="[^"]*"', f'<dimension ref="{dimension}"'.encode(),
+                                     contents[sheet])
+        assert n == 1
+        with zipfile.ZipFile(path, 'w') as z:
+            for name, data in contents.items():
+                z.writestr(name, data)
+    return str(path)
+
+
+def csv_round_trip_rows(filename):
+    """What reading the whole workbook, and writing the sheet out to a .csv, used to give"""
+    wb = openpyxl.load_workbook(filename)
+    return [['' if cell.value is None else str(cell.value) for cell in r] for r in wb.worksheets[0].rows]
+
+
+@pytest.mark.parametrize('dimension', [None, 'A1:B2', 'A1', 'A1:Z100'])
+def test_read_rows_ignores_declared_range(tmp_path, dimension):
+    filename = write_xlsx(tmp_path / 'statement.xlsx', dimension)
+    rows = list(xlsx_multitable_reader.XlsxRows(filename))
+    assert len(rows) == len(SHEET)
+    assert {len(r) for r in rows} == {5}
+    assert rows[2] == ['John Doe', '01/15/2023', '1234.5', '', '']
+    assert rows[3] == [''] * 5
+    assert rows[-1] == ['Salary', '2000', '80', '25', '']
+    assert rows == csv_round_trip_rows(filename)
+
+    # read_rows() gives the same rows, as wide as their last cell
+    unpadded = list(xlsx_multitable_reader.read_rows(filename))
+    assert [r + [''] * (5 - len(r)) for r in unpadded] == rows
+    assert unpadded[0] == ['Payslip Information']
+    assert unpadded[3] == []
+
+
+def test_read_rows_reads_as_iterated(tmp_path, monkeypatch):
+    filename = write_xlsx(tmp_path / 'statement.xlsx', 'A1')
+    parsed = []
+    parse = _reader.WorkSheetParser.parse
+
+    def counting_parse(self):
+        for row in parse(self):
+            parsed.append(row)
+            yield row
+    monkeypatch.setattr(_reader.WorkSheetParser, 'parse', counting_parse)
+    rows = xlsx_multitable_reader.read_rows(filename)
+    assert next(rows) == ['Payslip Information']
+    assert next(rows) == ['Name', 'Pay Date', 'Net Pay']
+    assert len(parsed) == 2
+    rows.close()
+
+
+def test_empty_sheet(tmp_path):
+    path = str(tmp_path / 'empty.xlsx')
+    openpyxl.Workbook().save(path)
+    assert list(xlsx_multitable_reader.read_rows(path)) == []
+    assert list(xlsx_multitable_reader.XlsxRows(path)) == []
@@ -0,0 +1,212 @@
+"""Row transforms for the readers in beancount_reds_importers, fused into a single function per row."""
+
+import re
+import petl as etl
+from petl.transform.basics import TransformError
+from beancount_reds_importers.libreader import amounts
+
+# Importers clean up their input in prepare_raw_file() and prepare_table(), typically with a stack of petl
+# calls: convertall() to strip cells, select() to drop rows, convert() and addfield() per column, etc. Each of
+# these is a separate lazy petl layer, so every row goes through a nested iterator per layer, and petl wraps
+# it in a new Record (whose field lookups scan the header) for each select() and addfield().
+#
+# Transform offers the same primitives, chained the same way:
+#
+#     rdr = transforms.Transform().strip(' \t').select(lambda x: any(i != '' for i in x)).apply(rdr)
+#
+# apply() compiles the chain against the table's header once: field names are resolved to indexes, and the
+# steps are fused into a single function per row. Header-only steps (rename(), cutout()'s header) cost nothing
+# per row. Semantics follow the petl equivalents:
+#   - strip(), convert() and convertall() only touch data rows, never the header. Cells that fail to convert
+#     become None
+#   - select() and addfield() functions are passed a record, that can be indexed by field name or position, or
+#     accessed by attribute, like petl's Record
+#   - addfield() and capture() append their fields at the end. addfield() first makes rows as wide as the header
+#     (short rows are padded with None, long rows are cut). Unlike petl's addfield(), a value function that
+#     fails gives None, as failed conversions do, rather than aborting the read
+#   - negate() flips the sign of an amount (see amounts.py)
+
+
+def record_type(fields):
+    """A tuple subclass for rows with the given fields, like petl's Record, but with O(1) field lookups"""
+    index = {}
+    for i, f in enumerate(fields):
+        index.setdefault(f, i)
+
+    class Record(tuple):
+        __slots__ = ()
+
+        def __getitem__(self, f):
+            if not isinstance(f, (int, slice)):
+                if f not in index:
+                    raise KeyError(f'item {f!r} not in fields {fields!r}')
+                f = index[f]
+            try:
+                return tuple.__getitem__(self, f)
+            except IndexError:  # short rows
+                return None
+
+        def __getattr__(self, f):
+            if f not in index:
+                raise AttributeError(f'item {f!r} not in fields {fields!r}')
+            return self[f]
+
+        def get(self, key, default=None):
+            try:
+                return self[key]
+            except KeyError:
+                return default
+
+    return Record
+
+
+def field_position(fields, field):
+    if isinstance(field, int):
+        return field
+    if field not in fields:
+        raise etl.errors.FieldSelectionError(field)
+    return fields.index(field)
+
+
+def convert_cell(func, v):
+    try:
+        return func(v)
+    except Exception:
+        return None
+
+
+class Transform():
+    def __init__(self):
+        # each step is a function that takes the fields (header) before the step, and returns the fields after
+        # it, and a function to transform a row (a list of cells) with, or None if only the header changes. Row
+        # functions return None to drop a row.
+        self.steps = []
+
+    def step(self, compile_step):
+        self.steps.append(compile_step)
+        return self
+
+    def convertall(self, func):
+        def compile_step(fields):
+            n = len(fields)  # like petl, cells beyond the header (of long rows) are left alone
+            return fields, lambda cells: [convert_cell(func, v) for v in cells[:n]] + cells[n:]
+        return self.step(compile_step)
+
+    def strip(self, chars=None):
+        """Strip whitespace (or chars) around all string cells"""
+        def compile_step(fields):
+            n = len(fields)
+
+            def strip_cells(cells):
+                return [v.strip(chars) if isinstance(v, str) else v for v in cells[:n]] + cells[n:]
+            return fields, strip_cells
+        return self.step(compile_step)
+
+    def convert(self, field, func):
+        def compile_step(fields):
+            i = field_position(fields, field)
+
+            def convert_row(cells):
+                if i < len(cells):
+                    cells[i] = convert_cell(func, cells[i])
+                return cells
+            return fields, convert_row
+        return self.step(compile_step)
+
+    def negate(self, field):
+        return self.convert(field, lambda v: -1 * amounts.parse(v))
+
+    def select(self, where):
+        def compile_step(fields):
+            record = record_type(fields)
+            return fields, lambda cells: cells if where(record(cells)) else None
+        return self.step(compile_step)
+
+    def addfield(self, field, value):
+        def compile_step(fields):
+            record = record_type(fields)
+            n = len(fields)
+
+            def add(cells):
+                if len(cells) != n:  # like petl, rows are first made as wide as the header
+                    cells = cells[:n] + [None] * (n - len(cells))
+                cells.append(convert_cell(value, record(cells)) if callable(value) else value)
+                return cells
+            return fields + [field], add
+        return self.step(compile_step)
+
+    def capture(self, field, pattern, newfields, include_original=False, flags=0, fill=None):
+        prog = re.compile(pattern, flags)
+
+        def compile_step(fields):
+            i = field_position(fields, field)
+            out_fields = list(fields) if include_original else fields[:i] + fields[i + 1:]
+
+            def capture_row(cells):
+                value = cells[i]
+                match = None if value is None else prog.search(value)
+                if not include_original:
+                    cells = cells[:i] + cells[i + 1:]
+                if match is not None:
+                    cells.extend(match.groups())
+                elif fill is not None:
+                    cells.extend(fill)
+                else:
+                    raise TransformError(f'value {value!r} did not match pattern {pattern!r}')
+                return cells
+            return out_fields + list(newfields), capture_row
+        return self.step(compile_step)
+
+    def rename(self, mapping):
+        return self.step(lambda fields: ([mapping.get(f, f) for f in fields], None))
+
+    def cutout(self, *cut_fields):
+        def compile_step(fields):
+            drop = {field_position(fields, f) for f in cut_fields}
+            keep = [i for i in range(len(fields)) if i not in drop]
+
+            def cut(cells):
+                if len(cells) < len(fields):  # short rows: fill in missing cells, like petl
+                    return [cells[i] if i < len(cells) else None for i in keep]
+                return [cells[i] for i in keep]
+            return [fields[i] for i in keep], cut
+        return self.step(compile_step)
+
+    def compile(self, header):
+        """Return the output header, and the fused function to transform each row of a table with header"""
+        fields = list(header)
+        row_functions = []
+        for compile_step in self.steps:
+            fields, row_function = compile_step(fields)
+            if row_function is not None:
+                row_functions.append(row_function)
+
+        def transform_row(row):
+            cells = list(row)
+            for row_function in row_functions:
+                cells = row_function(cells)
+                if cells is None:
+                    return None
+            return tuple(cells)
+        return tuple(fields), transform_row
+
+    def apply(self, rdr):
+        return TransformView(rdr, self)
+
+
+class TransformView(etl.Table):
+    def __init__(self, source, transform):
+        self.source = source
+        self.transform = transform
+
+    def __iter__(self):
+        it = iter(self.source)
+        header = next(it, None)
+        if header is None:
+            return
+        fields, transform_row = self.transform.compile(header)
+        yield fields
+        for row in it:
+            row = transform_row(row)
+            if row is not None:
+                yield row
@@ -5,10 +5,14 @@ importer modules in beancount_reds_importers."""
 from beancount.ingest import importer
 import petl as etl
 from beancount_reds_importers.libreader import csvreader
+from beancount_reds_importers.libreader import filebuffer
 
 
 class Importer(csvreader.Importer, importer.ImporterProtocol):
     FILE_EXTS = ['tsv']
 
     def read_raw(self, file):
+        return etl.fromtsv(filebuffer.petl_source(file.name))
+
+    def read_raw_stream(self, file):
         return etl.fromtsv(file.name)
@@ -2,8 +2,8 @@
 beancount_reds_importers."""
 
 import petl as etl
-import re
 from beancount_reds_importers.libreader import csvreader
+from beancount_reds_importers.libreader import filebuffer
 
 
 class Importer(csvreader.Importer):
@@ -16,7 +16,7 @@ class Importer(csvreader.Importer):
             self.reader_ready = False
 
             # TODO: this reads the entire file. Chop off after perhaps 2k or n lines
-            rdr = self.read_raw(file)
+            rdr = self.get_raw_table(file)
             header = ''
             for r in rdr:
                 line = ''.join(str(x) for x in r)
@@ -27,8 +27,12 @@ class Importer(csvreader.Importer):
             # self.reader_ready = re.match(self.header_identifier, file.head()) and \
             #                     account_number in file.head()
 
-            if re.match(self.header_identifier, header):
+            if self.header_regex.match(header):
                 self.reader_ready = True
 
     def read_raw(self, file):
-        return etl.fromxls(file.name)
+        return etl.fromxls(filebuffer.petl_source(file.name))
+
+    def read_raw_stream(self, file):
+        # spreadsheets are read whole
+        return self.read_raw(file)
@@ -2,14 +2,52 @@
 beancount_reds_importers."""
 
 import petl as etl
-from io import StringIO
-import csv
 import openpyxl
 import warnings
 from beancount_reds_importers.libreader import csv_multitable_reader
+from beancount_reds_importers.libreader import filebuffer
 
-# This xlsx reader uses petl to read a .csv with multiple tables into a dictionary of petl tables. The section
-# title is the key. See csv_multitable_reader for more.
+# This xlsx reader reads a sheet with multiple tables into a dictionary of petl tables. The section title is the
+# key. See csv_multitable_reader for more.
+#
+# The sheet is read in openpyxl's read-only mode, which streams rows from the file instead of building the whole
+# workbook in memory. Cells are turned into strings the same way writing the sheet out to a .csv would (empty
+# cells are ''), and rows go straight to the section splitter, without going through a .csv.
+#
+# The used range the file declares (its <dimension>) isn't trusted: some writers get it wrong, and openpyxl would
+# then silently drop the rows and columns outside it. So read_rows() reads every row in the file, as it is, and
+# only as far as it is iterated over (eg: get_section_head() stops at the section it looks for). The table of
+# the sheet (XlsxRows) pads rows to the width of the widest, as writing the sheet out to a .csv did. Its width
+# is only known once the whole sheet has been read, which is fine: the table is read in full, once per file
+# (see csvreader.get_raw_table()).
+
+
+def read_rows(filename):
+    """Rows of the first sheet of an xlsx file, as lists of strings, read as they are iterated over. Each row is
+    as wide as its last cell: see XlsxRows for rows of a uniform width"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        wb = openpyxl.load_workbook(filebuffer.open_binary(filename), read_only=True)
+    try:
+        sh = wb.worksheets[0]
+        sh.reset_dimensions()  # read all rows and columns, not just those in the declared range
+        for r in sh.iter_rows(values_only=True):
+            yield ['' if v is None else str(v) for v in r]
+    finally:
+        wb.close()
+
+
+class XlsxRows(etl.Table):
+    """petl table of the rows of the first sheet of an xlsx file (see read_rows()), all as wide as the widest"""
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __iter__(self):
+        rows = list(read_rows(self.filename))
+        width = max((len(r) for r in rows), default=0)
+        for r in rows:
+            r.extend([''] * (width - len(r)))
+        return iter(rows)
 
 
 class Importer(csv_multitable_reader.Importer):
@@ -22,23 +60,10 @@ class Importer(csv_multitable_reader.Importer):
             self.reader_ready = True
 
     def read_raw(self, file):
-        # return etl.fromcsv(file.name)
-
-        in_memory_file = StringIO()
-        csv_writer = csv.writer(in_memory_file)
-
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            wb = openpyxl.load_workbook(file.name)
-            sh = wb.worksheets[0]
-
-        for r in sh.rows:
-            csv_writer.writerow([cell.value for cell in r])
-        in_memory_file.seek(0)
-        rawlines = in_memory_file.read().encode()
-        raw = etl.MemorySource(rawlines)
-        rdr = etl.fromcsv(raw)
-        return rdr
+        return XlsxRows(file.name)
+
+    def iter_raw_rows(self, file):
+        return read_rows(file.name)
 
     def is_section_title(self, row):
         if len(row) == 1:
@@ -2,6 +2,7 @@
 beancount_reds_importers."""
 
 import petl as etl
+from beancount_reds_importers.libreader import filebuffer
 from beancount_reds_importers.libreader import xlsreader
 
 
@@ -9,7 +10,7 @@ class Importer(xlsreader.Importer):
     FILE_EXTS = ['xlsx']
 
     def read_raw(self, file):
-        rdr = etl.fromxlsx(file.name)
+        rdr = etl.fromxlsx(filebuffer.petl_source(file.name))
         # openpyxl gives us typed columns from the xlsx files (e.g. `float` for numeric
         # values, `datetime.datetime` for dates). Since xlsxreader currently inherits from csvreader,
         # converting these to be plain strings. Consider building a new xlsxreader that doesn't have to
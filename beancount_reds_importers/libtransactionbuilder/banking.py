@@ -8,6 +8,12 @@ from beancount_reds_importers.libtransactionbuilder import common
 
 
 class Importer(importer.ImporterProtocol):
+    # Transaction fields this builder uses. With 'project_columns' on, readers skip parsing and converting all
+    # other fields (see reader.used_fields()). Importers that use other fields in their hooks declare them in
+    # self.extra_fields
+    TRANSACTION_FIELDS = ['date', 'type', 'amount', 'payee', 'memo', 'currency', 'foreign_amount',
+                          'foreign_currency', 'balance']
+
     def __init__(self, config):
         self.config = config
         self.initialized = False
@@ -25,7 +31,7 @@ class Importer(importer.ImporterProtocol):
 
     def initialize(self, file):
         if not self.initialized:
-            self.custom_init()
+            self.compile_importer()
             self.initialize_reader(file)
             self.initialized = True
 
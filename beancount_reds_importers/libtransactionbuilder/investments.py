@@ -12,6 +12,12 @@ from beancount_reds_importers.libtransactionbuilder import common
 
 
 class Importer(importer.ImporterProtocol):
+    # Transaction fields this builder uses. With 'project_columns' on, readers skip parsing and converting all
+    # other fields (see reader.used_fields()). Importers that use other fields in their hooks declare them in
+    # self.extra_fields
+    TRANSACTION_FIELDS = ['date', 'tradeDate', 'settleDate', 'type', 'income_type', 'security', 'memo', 'units',
+                          'unit_price', 'total', 'amount', 'fees', 'commission', 'currency']
+
     def __init__(self, config):
         self.config = config
         self.initialized = False
@@ -59,7 +65,7 @@ class Importer(importer.ImporterProtocol):
 
     def initialize(self, file):
         if not self.initialized:
-            self.custom_init()
+            self.compile_importer()
             self.initialize_reader(file)
             if self.reader_ready:
                 # TODO: get self.currency to be defined by the reader (ofx, csv, etc.), overridable by config
@@ -140,7 +146,7 @@ class Importer(importer.ImporterProtocol):
             # try to extract security info from ofx
             ofx_securities = {}
             try:
-                for o in self.ofx.security_list:
+                for o in self.security_list or []:
                     # Not all institutions provide securities info, nor is the format standardized.
                     # We do this on a best effort basis and guess the format based on Fidelity's,
                     # where self.get_security_list() returns cusips via uniqueid
@@ -174,11 +180,7 @@ class Importer(importer.ImporterProtocol):
         return f"[{ticker}] {ticker_long_name}"
 
     def get_security_list(self):
-        tickers = set()
-        for ot in self.get_transactions():
-            if hasattr(ot, 'security'):
-                tickers.add(ot.security)
-        return tickers
+        return set(self.get_summary().securities)
 
     def main_acct(self, ticker):
         return self.config['main_account'].format(ticker=ticker)
@@ -54,6 +54,10 @@ def flip_if_needed(amount, account):
 
 
 class Importer(banking.Importer):
+    # Fields of the paycheck's section rows that build_postings() uses. With 'project_columns' on, multitable
+    # readers drop all other columns (see csv_multitable_reader.py)
+    SECTION_FIELDS = ['description', 'bank', 'amount', 'amount_in_pay_group_currency']
+
     def file_date(self, input_file):
         return self.paycheck_date(input_file)
 
@@ -65,10 +69,10 @@ class Importer(banking.Importer):
         currency = self.config['currency']
         total = 0
 
-        for section, table in self.alltables.items():
+        for section in self.alltables:
             if section not in template:
-                continue
-            for row in table.namedtuples():
+                continue  # skipped without building the section (see csv_multitable_reader.py)
+            for row in self.alltables[section].namedtuples():
                 # TODO: 'bank' is workday specific; move it there
                 row_description = getattr(row, 'description', getattr(row, 'bank', None))
                 row_pattern = next(filter(lambda ts: row_description.startswith(ts), template[section]), None)